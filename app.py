@@ -1,55 +1,254 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, g, Response, stream_with_context
 from models import db, Role, Employee, BiometricData, AuthenticationLog
-from database import init_database
+from config import DatabaseConfig, install_sqlite_pragmas
+from database import init_database, migrate_face_encodings, upgrade_schema, check_query_plans
+from face_encoding import ALGORITHM_VERSION, SIGNATURE_FIELDS, encode_face_vector, signature_to_vector
+from gallery import build_snapshot, gallery, record_gallery_changes
+from detection import detector_pool, full_range_detector_pool, detect_faces, detect_faces_batch
+from image_io import DecodedFrame, read_request_image, read_request_images, read_request_value
+from workers import detection_workers
+from log_writer import log_writer
+from timing import StageTimer
+from tracker import face_tracker, tracking_frame
+from cascade import DEFAULT_CASCADE_PATH, face_cascade
+from streaming import stream_hub
+from result_cache import result_cache
+from quality import DEFAULT_THRESHOLDS as DEFAULT_QUALITY_THRESHOLDS, MESSAGES as QUALITY_MESSAGES, check_face, check_frame
+from stats import dashboard_counts, rebuild_daily_stats
+from directory import PER_PAGE, employee_page, employee_to_dict
+from importer import CHUNK_SIZE, import_employees, placeholder_biometric, read_import_rows
+from enrollment import BATCH_SIZE as ENROLL_BATCH_SIZE, enroll_directory
+from audit_logs import MAX_PAGE_SIZE, PAGE_SIZE, iter_log_export, logs_page, parse_log_filters
+import metrics
+from metrics import auth_results, http_requests, http_request_duration
 from datetime import datetime
 import random
+import click
+import os
+import threading
 # Add these imports to your app.py
-import cv2
-import mediapipe as mp
+import time
 import numpy as np
-import base64
-from io import BytesIO
-from PIL import Image
-import hashlib
-
-# Initialize MediaPipe
-mp_face_detection = mp.solutions.face_detection
-mp_drawing = mp.solutions.drawing_utils
 
 app = Flask(__name__)
 app.secret_key = 'facial-recognition-key'
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///facial_recognition.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW and DB_POOL_TIMEOUT can be set in the environment
+app.config.from_object(DatabaseConfig)
+# Gallery search index: 'flat' (exact) or 'ivf' (approximate, see benchmarks/bench_face_index.py)
+app.config['FACE_INDEX'] = 'flat'
+app.config['FACE_INDEX_PARAMS'] = {}
+app.config['FACE_INDEX_PATH'] = None
+# Seconds between polls of the gallery change feed for other workers' enrollments
+app.config['GALLERY_SYNC_INTERVAL'] = 2.0
+# Shared memory-mapped gallery snapshot for multi-process serving (see `flask build-gallery-snapshot`)
+app.config['GALLERY_SNAPSHOT_PATH'] = None
+# Workers keep later enrollments in a small private overlay on top of the shared snapshot; once it
+# holds more rows than this, one worker rebuilds the snapshot and the others swap it in
+app.config['GALLERY_SNAPSHOT_REBUILD_ROWS'] = 1024
+# Pooled MediaPipe detectors; size to the number of request threads (defaults to CPU count)
+app.config['DETECTOR_POOL_SIZE'] = None
+# Create the detectors (or detection processes) in a background thread as each server process
+# starts, so the first requests do not pay for them; skipped by CLI commands other than `flask run`
+app.config['DETECTOR_WARMUP'] = True
+# 'thread' decodes and detects in the request thread, 'process' uses a worker process pool
+app.config['DETECTION_MODE'] = 'thread'
+app.config['DETECTION_WORKERS'] = None
+# Longest side frames are decoded/downscaled to before detection (None = full resolution);
+# bounding boxes are relative, so matching is unaffected
+app.config['DETECTION_MAX_SIDE'] = 640
+# AuthenticationLog rows are buffered and inserted in batches by a background thread
+app.config['LOG_WRITE_BEHIND'] = True
+app.config['LOG_QUEUE_SIZE'] = 10000
+app.config['LOG_BATCH_SIZE'] = 200
+app.config['LOG_FLUSH_INTERVAL'] = 0.5
+# A batch that fails with a transient error (e.g. "database is locked") is retried with
+# backoff, then written row by row so one bad row cannot lose the rest
+app.config['LOG_WRITE_RETRIES'] = 3
+app.config['LOG_RETRY_DELAY'] = 0.2
+# Reject blurry, badly lit frames and tiny faces before detection/matching (see quality.py)
+app.config['QUALITY_GATE'] = True
+# Continuous-camera tracking: reuse a confirmed match until drift, timeout or every N frames
+app.config['TRACKER_REDETECT_EVERY'] = 15
+app.config['TRACKER_TIMEOUT'] = 2.0
+app.config['TRACKER_MAX_DRIFT'] = 0.08
+app.config['TRACKER_MAX_SESSIONS'] = 1000
+# Frames with no usable face are reused while the whole scene drifts less than this (empty kiosk view)
+app.config['TRACKER_MAX_SCENE_DRIFT'] = 0.02
+# Cheap first detection stage: a Haar/LBP cascade on a CASCADE_MAX_SIDE gray copy rejects frames
+# without a face candidate and picks MediaPipe's short-range (0) or full-range (1) model from the
+# candidate's height relative to the frame (see benchmarks/bench_cascade.py before enabling)
+app.config['CASCADE_DETECTOR'] = False
+app.config['CASCADE_PATH'] = DEFAULT_CASCADE_PATH
+app.config['CASCADE_MAX_SIDE'] = 256
+app.config['CASCADE_NEAR_FACE_RATIO'] = 0.2
+app.config['QUALITY_THRESHOLDS'] = dict(DEFAULT_QUALITY_THRESHOLDS)
+# Results of recently seen frames (byte-identical, or within RESULT_CACHE_PHASH_DISTANCE bits of
+# perceptual hash when set) are reused until the TTL expires or the gallery changes
+app.config['RESULT_CACHE'] = True
+app.config['RESULT_CACHE_SIZE'] = 1024
+app.config['RESULT_CACHE_TTL'] = 5.0
+app.config['RESULT_CACHE_PHASH_DISTANCE'] = None
+# Streaming channel (/stream/<id>/frames + /stream/<id>/events): one processing thread per
+# open camera that only ever works on its newest frame. Sessions live in the process that
+# created them, so frames and events of one session must reach the same process: under a
+# multi-process server (wsgi.multiprocess, e.g. gunicorn -w 4) the routes refuse to run unless
+# STREAM_STICKY_ROUTING says the proxy pins each session id to one worker (e.g. an nginx upstream
+# hashing the id captured from /stream/<id>/), otherwise use a single process with threads
+app.config['STREAM_STICKY_ROUTING'] = False
+app.config['STREAM_MAX_SESSIONS'] = 100
+app.config['STREAM_IDLE_TIMEOUT'] = 30.0
+app.config['STREAM_KEEPALIVE'] = 15.0
 
 db.init_app(app)
+with app.app_context():
+    install_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+gallery.configure(app.config['FACE_INDEX'], app.config['FACE_INDEX_PARAMS'], app.config['FACE_INDEX_PATH'],
+                  app.config['GALLERY_SYNC_INTERVAL'], app.config['GALLERY_SNAPSHOT_PATH'],
+                  app.config['GALLERY_SNAPSHOT_REBUILD_ROWS'])
+detector_pool.configure(size=app.config['DETECTOR_POOL_SIZE'])
+full_range_detector_pool.configure(size=app.config['DETECTOR_POOL_SIZE'], model_selection=1)
+face_cascade.configure(app.config['CASCADE_PATH'], app.config['CASCADE_MAX_SIDE'],
+                       near_face_ratio=app.config['CASCADE_NEAR_FACE_RATIO'])
+if app.config['CASCADE_DETECTOR'] and not face_cascade.available:
+    app.logger.warning(f"Cascade file {app.config['CASCADE_PATH']} not found; detecting with MediaPipe only")
+    app.config['CASCADE_DETECTOR'] = False
+detection_workers.configure(size=app.config['DETECTION_WORKERS'], detect_max_side=app.config['DETECTION_MAX_SIDE'],
+                            cascade_settings=face_cascade.settings() if app.config['CASCADE_DETECTOR'] else None)
+log_writer.init_app(app)
+
+def warm_detectors():
+    """Create the detectors DETECTION_MODE uses now rather than inside the first requests"""
+    try:
+        if app.config['DETECTION_MODE'] == 'process':
+            detection_workers.warm()
+        else:
+            detector_pool.start()
+    except Exception as e:
+        app.logger.warning(f'Detector warm-up failed; detectors will be created on demand: {e}')
+
+def start_detector_warmup():
+    threading.Thread(target=warm_detectors, name='detector-warmup', daemon=True).start()
+
+def serving_process():
+    """False while running a `flask` CLI command other than `flask run`"""
+    ctx = click.get_current_context(silent=True)
+    return ctx is None or ctx.command.name == 'run'
+
+if app.config['DETECTOR_WARMUP'] and serving_process():
+    start_detector_warmup()
+    # gunicorn --preload forks workers after this import; the pools reset themselves in the child
+    os.register_at_fork(after_in_child=start_detector_warmup)
+face_tracker.configure(app.config['TRACKER_REDETECT_EVERY'], app.config['TRACKER_TIMEOUT'],
+                       app.config['TRACKER_MAX_DRIFT'], app.config['TRACKER_MAX_SESSIONS'],
+                       app.config['TRACKER_MAX_SCENE_DRIFT'])
+result_cache.configure(app.config['RESULT_CACHE_SIZE'], app.config['RESULT_CACHE_TTL'],
+                       app.config['RESULT_CACHE_PHASH_DISTANCE'], app.config['RESULT_CACHE'])
+metrics.instrument_sqlalchemy()
+metrics.registry.gauge('detector_pool_size', 'Configured MediaPipe detector pool size', lambda: detector_pool.size)
+metrics.registry.gauge('detector_pool_created', 'Detectors created so far', lambda: detector_pool.created)
+metrics.registry.gauge('detector_pool_in_use', 'Detectors currently checked out', lambda: detector_pool.in_use)
+metrics.registry.gauge('gallery_templates', 'Face templates in the in-memory gallery', lambda: len(gallery))
+metrics.registry.gauge('gallery_version', 'Last change-feed version applied to the gallery', lambda: gallery.version)
+metrics.registry.gauge('tracker_sessions', 'Camera sessions with a tracked face', lambda: len(face_tracker))
+metrics.registry.gauge('tracker_frames_tracked_total', 'Stream frames answered from the tracker',
+                       lambda: face_tracker.tracked, 'counter')
+metrics.registry.gauge('tracker_frames_redetected_total', 'Stream frames that ran detection and matching',
+                       lambda: face_tracker.redetected, 'counter')
+metrics.registry.gauge('tracker_static_scenes_total', 'Stream frames without a face reused from an unchanged scene',
+                       lambda: face_tracker.static_scenes, 'counter')
+metrics.registry.gauge('cascade_frames_screened_total', 'Frames screened by the cascade detector stage',
+                       lambda: face_cascade.screened, 'counter')
+metrics.registry.gauge('cascade_frames_rejected_total', 'Frames the cascade stage kept from MediaPipe',
+                       lambda: face_cascade.rejected, 'counter')
+metrics.registry.gauge('result_cache_entries', 'Frames in the result cache', lambda: len(result_cache))
+metrics.registry.gauge('result_cache_hits_total', 'Frames answered from the result cache',
+                       lambda: result_cache.hits, 'counter')
+metrics.registry.gauge('result_cache_near_hits_total', 'Cache hits matched by perceptual hash',
+                       lambda: result_cache.near_hits, 'counter')
+metrics.registry.gauge('result_cache_misses_total', 'Frames not found in the result cache',
+                       lambda: result_cache.misses, 'counter')
+metrics.registry.gauge('result_cache_evictions_total', 'Result cache entries evicted by the size bound',
+                       lambda: result_cache.evictions, 'counter')
+metrics.registry.gauge('result_cache_invalidations_total', 'Result cache entries dropped on gallery changes',
+                       lambda: result_cache.invalidations, 'counter')
+metrics.registry.gauge('result_cache_hit_ratio', 'Result cache hits / lookups', result_cache.hit_ratio)
+metrics.registry.gauge('stream_sessions', 'Open streaming camera sessions', lambda: len(stream_hub))
+metrics.registry.gauge('stream_frames_processed_total', 'Stream frames processed',
+                       lambda: stream_hub.stats()['processed'], 'counter')
+metrics.registry.gauge('stream_frames_dropped_total', 'Stream frames replaced by a newer one before processing',
+                       lambda: stream_hub.stats()['dropped'], 'counter')
+metrics.registry.gauge('log_writer_queue_depth', 'AuthenticationLog rows waiting to be written', lambda: log_writer.depth)
+metrics.registry.gauge('log_writer_rows_written_total', 'AuthenticationLog rows written by the log writer',
+                       lambda: log_writer.written, 'counter')
+metrics.registry.gauge('log_writer_rows_failed_total', 'AuthenticationLog rows that failed to write',
+                       lambda: log_writer.failed, 'counter')
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    http_requests.labels(route, request.method, response.status_code).inc()
+    http_request_duration.labels(route, request.method).observe(time.perf_counter() - g.request_start)
+    return response
 
 @app.route('/')
 def dashboard():
-    total_employees = Employee.query.count()
-    active_employees = Employee.query.filter_by(is_active=True).count()
-    today_auths = AuthenticationLog.query.filter(
-        AuthenticationLog.attempt_timestamp >= datetime.utcnow().date()
-    ).count()
+    # Counters come from the daily rollup, so the cost does not grow with the log table
+    counts = dashboard_counts()
     recent_logs = AuthenticationLog.query.order_by(
         AuthenticationLog.attempt_timestamp.desc()
     ).limit(5).all()
     
-    total_attempts = AuthenticationLog.query.count()
-    successful_attempts = AuthenticationLog.query.filter_by(result='SUCCESS').count()
+    total_attempts = counts['total_attempts']
+    successful_attempts = counts['successful_attempts']
     success_rate = round((successful_attempts / total_attempts) * 100, 1) if total_attempts > 0 else 0
     
     return render_template('dashboard.html', 
-                         total_employees=total_employees,
-                         active_employees=active_employees,
-                         today_auths=today_auths,
+                         total_employees=counts['total_employees'],
+                         active_employees=counts['active_employees'],
+                         today_auths=counts['today_auths'],
                          success_rate=success_rate,
                          recent_logs=recent_logs)
 
+def read_directory_args():
+    return dict(
+        search=request.args.get('q', ''),
+        sort=request.args.get('sort', 'name'),
+        direction=request.args.get('dir', 'asc'),
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', PER_PAGE, type=int)
+    )
+
 @app.route('/employees')
 def employees():
-    employees_list = db.session.query(Employee, Role).join(Role).all()
+    args = read_directory_args()
+    try:
+        directory = employee_page(**args)
+    except ValueError as e:
+        flash(str(e), 'error')
+        args.update(sort='name', direction='asc')
+        directory = employee_page(**args)
     roles = Role.query.all()
-    return render_template('employees.html', employees=employees_list, roles=roles)
+    return render_template('employees.html', directory=directory, employees=directory['rows'],
+                           roles=roles, args=args)
+
+@app.route('/api/employees')
+def employees_api():
+    """JSON page of the employee directory: ?q=&sort=name|email|department|id&dir=asc|desc&page=&per_page="""
+    try:
+        directory = employee_page(**read_directory_args())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'employees': [employee_to_dict(employee, role) for employee, role in directory['rows']],
+        'page': directory['page'],
+        'per_page': directory['per_page'],
+        'total': directory['total'],
+        'pages': directory['pages']
+    })
 
 @app.route('/add_employee', methods=['POST'])
 def add_employee():
@@ -62,15 +261,11 @@ def add_employee():
             department=request.form['department']
         )
         db.session.add(new_employee)
-        db.session.commit()
+        db.session.flush()
         
-        biometric = BiometricData(
-            employee_id=new_employee.employee_id,
-            face_encoding=f'ENCODING_{new_employee.first_name}'.encode(),
-            confidence_score=round(random.uniform(0.85, 0.95), 2),
-            algorithm_version='FaceNet_v1.0'
-        )
+        biometric = BiometricData(**placeholder_biometric(new_employee.employee_id, new_employee.first_name))
         db.session.add(biometric)
+        record_gallery_changes([new_employee.employee_id])
         db.session.commit()
         
         flash(f'Employee {new_employee.full_name} added successfully!', 'success')
@@ -80,6 +275,25 @@ def add_employee():
     
     return redirect(url_for('employees'))
 
+@app.route('/employees/import', methods=['POST'])
+def import_employees_endpoint():
+    """Bulk import from an uploaded CSV/JSON file ('file') or a JSON body; returns per-row errors"""
+    try:
+        upload = request.files.get('file')
+        if upload:
+            fmt = request.form.get('format') or ('json' if upload.filename.lower().endswith('.json') else 'csv')
+            rows = read_import_rows(upload.read().decode('utf-8-sig'), fmt)
+        elif request.is_json:
+            rows = read_import_rows(request.get_data(as_text=True), 'json')
+        else:
+            rows = read_import_rows(request.get_data(as_text=True), request.args.get('format', 'csv'))
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Could not read import: {e}'}), 400
+    chunk_size = request.args.get('chunk_size', CHUNK_SIZE, type=int)
+    if chunk_size < 1:
+        return jsonify({'error': 'chunk_size must be at least 1'}), 400
+    return jsonify(import_employees(rows, chunk_size))
+
 @app.route('/authentication')
 def authentication():
     employees_list = Employee.query.filter_by(is_active=True).all()
@@ -87,6 +301,7 @@ def authentication():
 
 @app.route('/simulate_auth', methods=['POST'])
 def simulate_authentication():
+    timer = StageTimer()
     employee_id = request.json.get('employee_id')
     employee = Employee.query.get(employee_id)
     
@@ -95,232 +310,621 @@ def simulate_authentication():
     
     confidence = round(random.uniform(0.60, 0.95), 2)
     result = 'SUCCESS' if confidence > 0.75 else 'FAILED'
-    processing_time = random.randint(800, 1800)
-    
-    auth_log = AuthenticationLog(
-        employee_id=employee_id,
-        result=result,
-        confidence_score=confidence,
-        failure_reason='Low confidence score' if result == 'FAILED' else None,
-        device_location='Prototype Simulator',
-        processing_time_ms=processing_time
-    )
+    processing_time = timer.total_ms()
     
-    db.session.add(auth_log)
-    if result == 'SUCCESS':
-        employee.last_login = datetime.utcnow()
-    db.session.commit()
+    # Queued for the background writer, which also updates last_login on success
+    with timer.stage('db_write'):
+        auth_log = log_writer.submit(
+            employee_id=employee.employee_id,
+            result=result,
+            confidence_score=confidence,
+            failure_reason='Low confidence score' if result == 'FAILED' else None,
+            device_location='Prototype Simulator',
+            processing_time_ms=processing_time
+        )
+    auth_results.labels('simulate_auth', result).inc()
     
     return jsonify({
         'result': result,
         'employee_name': employee.full_name,
         'confidence': confidence,
         'processing_time': processing_time,
-        'timestamp': auth_log.attempt_timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        'timings': timer.breakdown(),
+        'timestamp': auth_log['attempt_timestamp'].strftime('%Y-%m-%d %H:%M:%S')
     })
 
+def record_worker_timings(timer, call_ns, stage_ns):
+    # Time spent outside the worker's own decode and quality check (IPC included) counts as detection
+    timer.add('decode', stage_ns['decode'])
+    timer.add('quality', stage_ns['quality'])
+    timer.add('detection', call_ns - stage_ns['decode'] - stage_ns['quality'])
+
+def quality_thresholds():
+    """Thresholds for the frame quality gate, or None when it is disabled"""
+    return app.config['QUALITY_THRESHOLDS'] if app.config['QUALITY_GATE'] else None
+
+def decode_and_detect(image_bytes, timer, thresholds=None):
+    """Decode a frame at detection resolution and detect faces, inline or on the detection process pool
+
+    Returns (frame, faces, rejection): frame.shape is the source size and
+    frame.crop() decodes a full-resolution face region on demand. With
+    thresholds, frames failing the quality gate skip detection and
+    rejection holds the reason code.
+    """
+    if app.config['DETECTION_MODE'] == 'process':
+        call_start = time.perf_counter_ns()
+        image_shape, faces, stage_ns, rejection = detection_workers.detect(image_bytes, thresholds)
+        record_worker_timings(timer, time.perf_counter_ns() - call_start, stage_ns)
+        return DecodedFrame(image_bytes, image_shape), faces, rejection
+    with timer.stage('decode'):
+        frame = DecodedFrame.decode(image_bytes, app.config['DETECTION_MAX_SIDE'])
+    if thresholds:
+        with timer.stage('quality'):
+            rejection = check_frame(frame.rgb, thresholds)
+        if rejection:
+            return frame, [], rejection
+    with timer.stage('detection'):
+        faces = face_cascade.detect(frame.rgb) if app.config['CASCADE_DETECTOR'] else detect_faces(frame.rgb)
+    return frame, faces, None
+
+def decode_and_detect_many(images, timer, thresholds=None):
+    """decode_and_detect for a batch of frames in one detection pass"""
+    if app.config['DETECTION_MODE'] == 'process':
+        call_start = time.perf_counter_ns()
+        results = detection_workers.detect_many(images, thresholds)
+        # Frames are processed in parallel, so report the summed in-worker decode and quality time
+        stage_ns = {
+            stage: sum(frame_ns[stage] for _, _, frame_ns, _ in results)
+            for stage in ('decode', 'quality')
+        }
+        record_worker_timings(timer, time.perf_counter_ns() - call_start, stage_ns)
+        return [
+            (DecodedFrame(image_bytes, image_shape), faces, rejection)
+            for image_bytes, (image_shape, faces, _, rejection) in zip(images, results)
+        ]
+    with timer.stage('decode'):
+        frames = [DecodedFrame.decode(image_bytes, app.config['DETECTION_MAX_SIDE']) for image_bytes in images]
+    rejections = [None] * len(frames)
+    if thresholds:
+        with timer.stage('quality'):
+            rejections = [check_frame(frame.rgb, thresholds) for frame in frames]
+    with timer.stage('detection'):
+        accepted = [frame.rgb for frame, rejection in zip(frames, rejections) if rejection is None]
+        accepted_faces = iter(face_cascade.detect_batch(accepted) if app.config['CASCADE_DETECTOR']
+                              else detect_faces_batch(accepted))
+    return [
+        (frame, [] if rejection else next(accepted_faces), rejection)
+        for frame, rejection in zip(frames, rejections)
+    ]
+
 @app.route('/enroll_face', methods=['POST'])
 def enroll_face():
     """Enroll a face using MediaPipe"""
+    timer = StageTimer()
     try:
-        employee_id = request.json.get('employee_id')
-        image_data = request.json.get('image_data')
-        
-        # Decode base64 image
-        image_data = image_data.split(',')[1]
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(BytesIO(image_bytes))
-        
-        # Convert to OpenCV format
-        opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        # Accepts a JSON data URL, a multipart upload or a raw image/jpeg body
+        employee_id = read_request_value(request, 'employee_id')
+        frame, faces, _ = decode_and_detect(read_request_image(request), timer)
         
-        # Detect faces with MediaPipe
-        with mp_face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.5) as face_detection:
-            rgb_image = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2RGB)
-            results = face_detection.process(rgb_image)
+        if faces:
+            # Create a simple face "signature" based on the bounding box
+            face = faces[0]  # Use first detected face
             
-            if results.detections:
-                # Create a simple face "signature" based on bounding box and landmarks
-                detection = results.detections[0]  # Use first detected face
-                
-                # Get bounding box
-                bbox = detection.location_data.relative_bounding_box
-                h, w, _ = opencv_image.shape
-                
+            with timer.stage('feature_extraction'):
                 # Create face signature (simplified for prototype)
                 face_signature = {
-                    'bbox_x': bbox.xmin,
-                    'bbox_y': bbox.ymin,
-                    'bbox_width': bbox.width,
-                    'bbox_height': bbox.height,
-                    'confidence': detection.score[0]
+                    'bbox_x': face.xmin,
+                    'bbox_y': face.ymin,
+                    'bbox_width': face.width,
+                    'bbox_height': face.height,
+                    'confidence': face.score
                 }
                 
-                # Convert to string for storage
-                face_encoding = str(face_signature).encode()
-                
-                # Store or update biometric data
+                # Pack into the compact binary template format
+                face_vector = signature_to_vector(face_signature)
+                face_encoding = encode_face_vector(face_vector)
+            
+            # Store or update biometric data
+            with timer.stage('db_write'):
                 biometric = BiometricData.query.filter_by(employee_id=employee_id).first()
                 if biometric:
                     biometric.face_encoding = face_encoding
-                    biometric.confidence_score = detection.score[0]
-                    biometric.algorithm_version = 'MediaPipe_v1.0'
+                    biometric.confidence_score = face.score
+                    biometric.algorithm_version = ALGORITHM_VERSION
                 else:
                     biometric = BiometricData(
                         employee_id=employee_id,
                         face_encoding=face_encoding,
-                        confidence_score=detection.score[0],
-                        algorithm_version='MediaPipe_v1.0',
+                        confidence_score=face.score,
+                        algorithm_version=ALGORITHM_VERSION,
                         is_active=True
                     )
                     db.session.add(biometric)
                 
+                record_gallery_changes([employee_id])
                 db.session.commit()
-                
-                return jsonify({
-                    'success': True,
-                    'message': 'Face enrolled successfully with MediaPipe',
-                    'confidence': float(detection.score[0]),
-                    'faces_detected': len(results.detections)
-                })
-            else:
-                return jsonify({
-                    'success': False,
-                    'message': 'No face detected in image'
-                }), 400
-                
+            if biometric.is_active:
+                gallery.upsert(int(employee_id), face_vector)
+            
+            return jsonify({
+                'success': True,
+                'message': 'Face enrolled successfully with MediaPipe',
+                'confidence': float(face.score),
+                'faces_detected': len(faces),
+                'processing_time': timer.total_ms(),
+                'timings': timer.breakdown()
+            })
+        else:
+            return jsonify({
+                'success': False,
+                'message': 'No face detected in image'
+            }), 400
+            
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'Error processing image: {str(e)}'
         }), 500
 
+def analyze_frame(image_bytes, timer, thresholds):
+    """Quality-gate, detect and match one frame: (rejection, face, best_employee_id, best_similarity)"""
+    frame, faces, rejection = decode_and_detect(image_bytes, timer, thresholds)
+    if faces and thresholds:
+        with timer.stage('quality'):
+            rejection = check_face(faces[0], frame.shape, thresholds)
+    if rejection or not faces:
+        return rejection, None, None, 0.0
+    
+    # Get the detected face
+    face = faces[0]
+    
+    with timer.stage('feature_extraction'):
+        current_face = {
+            'bbox_x': face.xmin,
+            'bbox_y': face.ymin,
+            'bbox_width': face.width,
+            'bbox_height': face.height,
+            'confidence': face.score
+        }
+        probe = signature_to_vector(current_face)
+    
+    # Compare with every stored face in a single vectorized pass
+    with timer.stage('gallery_match'):
+        best_employee_id, best_similarity = gallery.best_match(probe)
+    return None, face, best_employee_id, best_similarity
+
+def authenticate_frame(image_bytes, timer, endpoint):
+    """Authenticate one frame and log the attempt; returns (response payload, detected face or None)
+
+    Frames already seen (retries, double clicks) reuse the cached
+    analysis while the gallery is unchanged; the attempt is still logged.
+    """
+    with timer.stage('cache'):
+        gallery.ensure_loaded()
+        generation = gallery.generation
+        cache_key = result_cache.key(image_bytes)
+        analysis = result_cache.get(cache_key, generation)
+    cached = analysis is not None
+    if not cached:
+        analysis = analyze_frame(image_bytes, timer, quality_thresholds())
+        result_cache.put(cache_key, generation, analysis)
+    payload, face = frame_result(analysis, timer, endpoint)
+    payload['cached'] = cached
+    return payload, face
+
+def frame_result(analysis, timer, endpoint):
+    """Log an analyzed frame and build its response payload"""
+    rejection, face, best_employee_id, best_similarity = analysis
+    if rejection:
+        # Unusable frame: tell the kiosk why instead of attempting a match
+        with timer.stage('db_write'):
+            log_writer.submit(
+                employee_id=None,
+                result='FAILED',
+                confidence_score=0.0,
+                failure_reason=rejection,
+                device_location='MediaPipe Camera',
+                processing_time_ms=timer.total_ms()
+            )
+        auth_results.labels(endpoint, rejection).inc()
+        return {
+            'result': 'FAILED',
+            'reason': rejection,
+            'message': QUALITY_MESSAGES[rejection],
+            'confidence': 0.0,
+            'processing_time': timer.total_ms(),
+            'timings': timer.breakdown()
+        }, None
+    
+    if face is None:
+        auth_results.labels(endpoint, 'NO_FACE').inc()
+        return {
+            'result': 'FAILED',
+            'message': 'No face detected',
+            'confidence': 0.0,
+            'processing_time': timer.total_ms(),
+            'timings': timer.breakdown()
+        }, None
+    
+    with timer.stage('gallery_match'):
+        best_match = Employee.query.get(best_employee_id) if best_employee_id is not None else None
+    
+    if best_match:
+        employee = best_match
+        result = 'SUCCESS' if best_similarity > 0.8 else 'FAILED'
+        
+        # Log authentication (written behind; last_login is updated on success)
+        with timer.stage('db_write'):
+            auth_log = log_writer.submit(
+                employee_id=employee.employee_id,
+                result=result,
+                confidence_score=best_similarity,
+                failure_reason=None if result == 'SUCCESS' else 'Low similarity score',
+                device_location='MediaPipe Camera',
+                processing_time_ms=timer.total_ms()
+            )
+        auth_results.labels(endpoint, result).inc()
+        
+        return {
+            'result': result,
+            'employee_name': employee.full_name,
+            'employee_id': employee.employee_id,
+            'confidence': round(best_similarity, 3),
+            'processing_time': auth_log['processing_time_ms'],
+            'timings': timer.breakdown(),
+            'timestamp': auth_log['attempt_timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
+            'role': employee.role.role_name
+        }, face
+    else:
+        # Unknown person
+        auth_results.labels(endpoint, 'UNKNOWN').inc()
+        return {
+            'result': 'FAILED',
+            'message': 'Unknown person or low confidence',
+            'confidence': round(best_similarity, 3),
+            'processing_time': timer.total_ms(),
+            'timings': timer.breakdown()
+        }, face
+        
+
 @app.route('/authenticate_face_mediapipe', methods=['POST'])
 def authenticate_face_mediapipe():
     """Real facial recognition using MediaPipe"""
+    timer = StageTimer()
     try:
-        image_data = request.json.get('image_data')
+        # Accepts a JSON data URL, a multipart upload or a raw image/jpeg body
+        payload, _ = authenticate_frame(read_request_image(request), timer, 'authenticate_face_mediapipe')
+        return jsonify(payload)
+            
+    except Exception as e:
+        auth_results.labels('authenticate_face_mediapipe', 'ERROR').inc()
+        return jsonify({
+            'result': 'ERROR',
+            'message': f'Processing error: {str(e)}',
+            'confidence': 0.0
+        }), 500
+
+def authenticate_tracked(session_id, image_bytes, timer, endpoint):
+    """authenticate_frame, answered from the session's tracked face while it holds still"""
+    with timer.stage('tracking'):
+        gray = tracking_frame(image_bytes)
+        payload = face_tracker.lookup(session_id, gray)
+    if payload is not None:
+        auth_results.labels(endpoint, 'TRACKED').inc()
+        return {
+            **payload,
+            'tracked': True,
+            'processing_time': timer.total_ms(),
+            'timings': timer.breakdown()
+        }
+    
+    payload, face = authenticate_frame(image_bytes, timer, endpoint)
+    face_tracker.update(session_id, gray, face, payload)
+    return {**payload, 'tracked': False}
+
+def process_stream_frame(session_id, image_bytes):
+    """Run by a stream session's thread for the newest frame of its camera"""
+    with app.app_context():
+        return authenticate_tracked(session_id, image_bytes, StageTimer(), 'stream')
+
+stream_hub.configure(app.config['STREAM_MAX_SESSIONS'], app.config['STREAM_IDLE_TIMEOUT'], process_stream_frame)
+
+@app.route('/authenticate_stream', methods=['POST'])
+def authenticate_stream():
+    """Continuous-camera authentication: frames of one session reuse the last confirmed match while the face holds still"""
+    timer = StageTimer()
+    try:
+        session_id = request.headers.get('X-Session-Id') or read_request_value(request, 'session_id')
+        if not session_id:
+            return jsonify({
+                'result': 'ERROR',
+                'message': 'session_id (or X-Session-Id header) is required'
+            }), 400
+        return jsonify(authenticate_tracked(session_id, read_request_image(request), timer, 'authenticate_stream'))
         
-        # Decode image
-        image_data = image_data.split(',')[1]
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(BytesIO(image_bytes))
+    except Exception as e:
+        auth_results.labels('authenticate_stream', 'ERROR').inc()
+        return jsonify({
+            'result': 'ERROR',
+            'message': f'Processing error: {str(e)}',
+            'confidence': 0.0
+        }), 500
+
+def stream_routing_error():
+    """Error response when stream requests could be spread over several processes, else None"""
+    if request.environ.get('wsgi.multiprocess') and not app.config['STREAM_STICKY_ROUTING']:
+        return jsonify({
+            'result': 'ERROR',
+            'message': 'Streaming needs a single server process or STREAM_STICKY_ROUTING; '
+                       'use /authenticate_stream instead'
+        }), 501
+    return None
+
+@app.route('/stream/<session_id>/frames', methods=['POST'])
+def stream_frame(session_id):
+    """Hand a camera frame (raw image/jpeg body) to the session's stream; replaces any unprocessed frame"""
+    error = stream_routing_error()
+    if error:
+        return error
+    try:
+        image_bytes = read_request_image(request)
+    except Exception as e:
+        return jsonify({'result': 'ERROR', 'message': f'Invalid frame: {str(e)}'}), 400
+    if not image_bytes:
+        return jsonify({'result': 'ERROR', 'message': 'No frame provided'}), 400
+    session = stream_hub.submit(session_id, image_bytes)
+    if session is None:
+        return jsonify({'result': 'ERROR', 'message': 'Too many open streams'}), 503
+    return jsonify({'accepted': True, 'received': session.received, 'dropped': session.dropped}), 202
+
+@app.route('/stream/<session_id>/events')
+def stream_events(session_id):
+    """Server-sent events: one 'result' event per processed frame of the session"""
+    error = stream_routing_error()
+    if error:
+        return error
+    if stream_hub.session(session_id) is None:
+        return jsonify({'result': 'ERROR', 'message': 'Too many open streams'}), 503
+    return Response(stream_hub.events(session_id, app.config['STREAM_KEEPALIVE']), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/stream/<session_id>', methods=['DELETE'])
+def close_stream(session_id):
+    stream_hub.close(session_id)
+    return '', 204
+
+@app.route('/authenticate_batch', methods=['POST'])
+def authenticate_batch():
+    """Authenticate every face in several frames against the gallery in one pass"""
+    timer = StageTimer()
+    try:
+        # Accepts a JSON list of data URLs ('images') or a multipart upload of several 'images'
+        images = read_request_images(request)
+        if not images:
+            return jsonify({
+                'result': 'ERROR',
+                'message': 'No images provided'
+            }), 400
+        thresholds = quality_thresholds()
+        frames = decode_and_detect_many(images, timer, thresholds)
+        
+        # Faces too small to match are reported but never searched
+        locations, rejected_faces = [], []
+        with timer.stage('quality'):
+            for image_index, (frame, faces, _) in enumerate(frames):
+                for face in faces:
+                    rejection = check_face(face, frame.shape, thresholds) if thresholds else None
+                    if rejection:
+                        rejected_faces.append((image_index, face, rejection))
+                    else:
+                        locations.append((image_index, face))
         
-        # Convert to OpenCV format
-        opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        # Every remaining detected face becomes one row of the probe matrix
+        # (DetectedFace fields follow the face signature order)
+        with timer.stage('feature_extraction'):
+            probes = np.array([face for _, face in locations], dtype=np.float32).reshape(-1, len(SIGNATURE_FIELDS))
         
-        # Detect faces with MediaPipe
-        with mp_face_detection.FaceDetection(model_selection=0, min_detection_confidence=0.5) as face_detection:
-            rgb_image = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2RGB)
-            results = face_detection.process(rgb_image)
+        with timer.stage('gallery_match'):
+            gallery.ensure_loaded()
+            matches = gallery.best_matches(probes) if locations else []
             
-            if not results.detections:
-                return jsonify({
+            matched_ids = {employee_id for employee_id, _ in matches if employee_id is not None}
+            employees_by_id = {
+                employee.employee_id: employee
+                for employee in Employee.query.filter(Employee.employee_id.in_(matched_ids)).all()
+            } if matched_ids else {}
+        
+        now = datetime.utcnow()
+        processing_time = timer.total_ms()
+        results = [{'image': image_index, 'faces': []} for image_index in range(len(frames))]
+        log_rows = []
+        rejections = [(image_index, None, rejection) for image_index, (_, _, rejection) in enumerate(frames) if rejection]
+        # Like the single-frame path, a frame is logged as failed only when none of its faces could be
+        # searched, and then once: background faces next to a matched one are not failed attempts
+        logged_frames = {image_index for image_index, _ in locations}
+        for image_index, face, rejection in rejections + rejected_faces:
+            if face is None:
+                results[image_index]['rejected'] = rejection
+                results[image_index]['message'] = QUALITY_MESSAGES[rejection]
+            else:
+                results[image_index]['faces'].append({
+                    'bbox': [face.xmin, face.ymin, face.width, face.height],
                     'result': 'FAILED',
-                    'message': 'No face detected',
-                    'confidence': 0.0
+                    'reason': rejection,
+                    'message': QUALITY_MESSAGES[rejection]
                 })
-            
-            # Get the detected face
-            detection = results.detections[0]
-            bbox = detection.location_data.relative_bounding_box
-            
-            current_face = {
-                'bbox_x': bbox.xmin,
-                'bbox_y': bbox.ymin,
-                'bbox_width': bbox.width,
-                'bbox_height': bbox.height,
-                'confidence': detection.score[0]
+            if image_index in logged_frames:
+                continue
+            logged_frames.add(image_index)
+            log_rows.append({
+                'employee_id': None,
+                'attempt_timestamp': now,
+                'result': 'FAILED',
+                'confidence_score': 0.0,
+                'failure_reason': rejection,
+                'device_location': 'MediaPipe Camera',
+                'processing_time_ms': processing_time
+            })
+            auth_results.labels('authenticate_batch', rejection).inc()
+        for (image_index, face), (employee_id, similarity) in zip(locations, matches):
+            face_result = {
+                'bbox': [face.xmin, face.ymin, face.width, face.height],
+                'confidence': round(similarity, 3)
             }
-            
-            # Compare with stored faces (simplified matching)
-            stored_biometrics = BiometricData.query.filter_by(is_active=True).all()
-            
-            best_match = None
-            best_similarity = 0.0
-            
-            for biometric in stored_biometrics:
-                try:
-                    # Parse stored face data
-                    stored_face_str = biometric.face_encoding.decode()
-                    stored_face = eval(stored_face_str)  # Simple eval for prototype
-                    
-                    # Calculate similarity based on bounding box similarity
-                    similarity = calculate_face_similarity(current_face, stored_face)
-                    
-                    if similarity > best_similarity and similarity > 0.7:  # Threshold
-                        best_similarity = similarity
-                        best_match = biometric
-                        
-                except Exception as e:
-                    continue  # Skip corrupted data
-            
-            if best_match:
-                employee = best_match.employee
-                result = 'SUCCESS' if best_similarity > 0.8 else 'FAILED'
-                
-                # Log authentication
-                auth_log = AuthenticationLog(
-                    employee_id=employee.employee_id,
+            employee = employees_by_id.get(employee_id)
+            if employee is None:
+                face_result.update(result='FAILED', message='Unknown person or low confidence')
+                auth_results.labels('authenticate_batch', 'UNKNOWN').inc()
+            else:
+                result = 'SUCCESS' if similarity > 0.8 else 'FAILED'
+                log_row = {
+                    'employee_id': employee.employee_id,
+                    'attempt_timestamp': now,
+                    'result': result,
+                    'confidence_score': similarity,
+                    'failure_reason': None if result == 'SUCCESS' else 'Low similarity score',
+                    'device_location': 'MediaPipe Camera',
+                    'processing_time_ms': processing_time
+                }
+                log_rows.append(log_row)
+                auth_results.labels('authenticate_batch', result).inc()
+                face_result.update(
                     result=result,
-                    confidence_score=best_similarity,
-                    failure_reason=None if result == 'SUCCESS' else 'Low similarity score',
-                    device_location='MediaPipe Camera',
-                    processing_time_ms=random.randint(800, 1500)
+                    employee_name=employee.full_name,
+                    employee_id=employee.employee_id,
+                    role=employee.role.role_name
                 )
-                
-                db.session.add(auth_log)
-                
-                if result == 'SUCCESS':
-                    employee.last_login = datetime.utcnow()
-                
-                db.session.commit()
-                
-                return jsonify({
-                    'result': result,
-                    'employee_name': employee.full_name,
-                    'employee_id': employee.employee_id,
-                    'confidence': round(best_similarity, 3),
-                    'processing_time': auth_log.processing_time_ms,
-                    'timestamp': auth_log.attempt_timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                    'role': employee.role.role_name
-                })
-            else:
-                # Unknown person
-                return jsonify({
-                    'result': 'FAILED',
-                    'message': 'Unknown person or low confidence',
-                    'confidence': round(best_similarity, 3)
-                })
-                
+            results[image_index]['faces'].append(face_result)
+        
+        # The log writer inserts the whole batch (and last_login updates) in one transaction
+        with timer.stage('db_write'):
+            log_writer.submit_many(log_rows)
+        
+        return jsonify({
+            'results': results,
+            'faces_detected': len(locations),
+            'processing_time': processing_time,
+            'timings': timer.breakdown(),
+            'timestamp': now.strftime('%Y-%m-%d %H:%M:%S')
+        })
+        
     except Exception as e:
+        auth_results.labels('authenticate_batch', 'ERROR').inc()
         return jsonify({
             'result': 'ERROR',
-            'message': f'Processing error: {str(e)}',
-            'confidence': 0.0
+            'message': f'Processing error: {str(e)}'
         }), 500
 
-def calculate_face_similarity(face1, face2):
-    """Calculate similarity between two face signatures (simplified for prototype)"""
-    try:
-        # Compare bounding box dimensions and positions
-        pos_diff = abs(face1['bbox_x'] - face2['bbox_x']) + abs(face1['bbox_y'] - face2['bbox_y'])
-        size_diff = abs(face1['bbox_width'] - face2['bbox_width']) + abs(face1['bbox_height'] - face2['bbox_height'])
-        
-        # Simple similarity calculation (0 to 1)
-        total_diff = pos_diff + size_diff
-        similarity = max(0, 1 - (total_diff * 2))  # Adjust multiplier for sensitivity
-        
-        return similarity
-    except:
-        return 0.0
-
 @app.route('/logs')
 def logs():
-    logs_list = db.session.query(AuthenticationLog, Employee).join(Employee).order_by(
-        AuthenticationLog.attempt_timestamp.desc()
-    ).limit(50).all()
-    return render_template('logs.html', logs=logs_list)
+    try:
+        filters = parse_log_filters(request.args)
+        limit = min(max(request.args.get('limit', PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+        logs_list, next_cursor = logs_page(filters, request.args.get('cursor'), limit)
+    except ValueError as e:
+        flash(str(e), 'error')
+        filters, logs_list, next_cursor = {}, [], None
+    next_args = {**request.args.to_dict(), 'cursor': next_cursor} if next_cursor else None
+    return render_template('logs.html', logs=logs_list, filters=request.args, next_args=next_args)
+
+@app.route('/logs/export')
+def export_logs():
+    """Stream the filtered logs as CSV (default) or NDJSON (?format=ndjson)"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    try:
+        filters = parse_log_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    filename = f'authentication_logs_{datetime.utcnow():%Y%m%d_%H%M%S}.{fmt}'
+    return Response(
+        stream_with_context(iter_log_export(filters, fmt)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.route('/log_writer/stats')
+def log_writer_stats():
+    return jsonify(log_writer.stats())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text-format metrics"""
+    return metrics.registry.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+@app.cli.command('migrate-encodings')
+def migrate_encodings_command():
+    """Rewrite legacy face encodings into the binary template format"""
+    migrated, skipped = migrate_face_encodings(app)
+    print(f"✅ Migrated {migrated} face encodings ({skipped} unreadable rows left untouched)")
+
+@app.cli.command('import-employees')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), help='Defaults to the file extension')
+@click.option('--chunk-size', type=click.IntRange(min=1), default=CHUNK_SIZE, show_default=True,
+              help='Rows per transaction')
+def import_employees_command(path, fmt, chunk_size):
+    """Bulk import employees from a CSV or JSON file"""
+    fmt = fmt or ('json' if path.lower().endswith('.json') else 'csv')
+    with open(path, encoding='utf-8-sig') as f:
+        rows = read_import_rows(f.read(), fmt)
+    started = time.perf_counter()
+    report = import_employees(rows, chunk_size)
+    elapsed = time.perf_counter() - started
+    for error in report['errors']:
+        print(f"❌ Row {error['row']} ({error['email'] or 'no email'}): {error['error']}")
+    print(f"✅ Imported {report['inserted']} of {report['total']} employees in {elapsed:.1f}s ({report['failed']} rejected)")
+
+@app.cli.command('enroll-directory')
+@click.argument('path', type=click.Path(exists=True))
+@click.option('--workers', type=int, help='Detection processes (default: CPU count)')
+@click.option('--batch-size', default=ENROLL_BATCH_SIZE, show_default=True, help='Templates per transaction')
+def enroll_directory_command(path, workers, batch_size):
+    """Enroll faces from a directory or zip of photos named by employee id or email"""
+    detection_workers.configure(size=workers or app.config['DETECTION_WORKERS'],
+                                detect_max_side=app.config['DETECTION_MAX_SIDE'])
+    report = enroll_directory(path, batch_size, progress=lambda done, total: print(f"… {done}/{total} photos"))
+    for failure in report['failures']:
+        print(f"❌ {failure['file']}: {failure['error']}")
+    print(f"✅ Enrolled {report['enrolled']} employees from {report['photos']} photos in {report['seconds']:.1f}s "
+          f"({report['photos_per_second']} photos/s, {report['failed']} failed)")
+    if app.config['GALLERY_SNAPSHOT_PATH']:
+        templates, version = build_snapshot(app.config['GALLERY_SNAPSHOT_PATH'])
+        print(f"✅ Gallery snapshot rebuilt ({templates} templates, version {version})")
+
+@app.cli.command('build-gallery-snapshot')
+@click.option('--path', help='Defaults to GALLERY_SNAPSHOT_PATH')
+def build_gallery_snapshot_command(path):
+    """Write the active gallery to the shared snapshot file; running workers swap it in on their next sync"""
+    path = path or app.config['GALLERY_SNAPSHOT_PATH']
+    if not path:
+        raise click.UsageError('Set GALLERY_SNAPSHOT_PATH or pass --path')
+    templates, version = build_snapshot(path)
+    print(f"✅ Wrote {templates} templates at version {version} to {path}")
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute the dashboard rollup from the full authentication log"""
+    days = rebuild_daily_stats()
+    print(f"✅ Rebuilt authentication stats for {days} days")
+
+@app.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Add tables and indexes that an existing database is missing"""
+    created = upgrade_schema(app)
+    print(f"✅ Schema up to date ({len(created)} indexes created: {', '.join(created) or 'none'})")
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any hot query falls back to a full table scan"""
+    results = check_query_plans(app)
+    for name, (ok, plan) in results.items():
+        print(f"{'✅' if ok else '❌'} {name}: {' | '.join(plan)}")
+    if not all(ok for ok, _ in results.values()):
+        raise SystemExit(1)
 
 if __name__ == '__main__':
     init_database(app)
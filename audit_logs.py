@@ -0,0 +1,124 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, tuple_
+
+from models import db, Employee, AuthenticationLog
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = (
+    'log_id', 'attempt_timestamp', 'employee_id', 'employee_name', 'department', 'result',
+    'confidence_score', 'device_location', 'processing_time_ms', 'failure_reason'
+)
+
+
+def _parse_date(value, name):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'{name} must be YYYY-MM-DD')
+
+
+def parse_log_filters(args):
+    """Read employee_id, result, device_location, date_from and date_to (inclusive) from query args"""
+    filters = {}
+    if args.get('employee_id'):
+        try:
+            filters['employee_id'] = int(args['employee_id'])
+        except ValueError:
+            raise ValueError('employee_id must be an integer')
+    if args.get('result'):
+        filters['result'] = args['result'].upper()
+    if args.get('device_location'):
+        filters['device_location'] = args['device_location']
+    if args.get('date_from'):
+        filters['date_from'] = _parse_date(args['date_from'], 'date_from')
+    if args.get('date_to'):
+        filters['date_to'] = _parse_date(args['date_to'], 'date_to') + timedelta(days=1)
+    return filters
+
+
+def encode_cursor(log):
+    return f'{log.attempt_timestamp.isoformat()}_{log.log_id}'
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, log_id = cursor.rsplit('_', 1)
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except ValueError:
+        raise ValueError('Invalid cursor')
+
+
+def logs_query(filters, cursor=None):
+    """(AuthenticationLog, Employee) newest first, continuing after cursor when given"""
+    # Outer join: frames rejected before matching are logged without an employee
+    query = select(AuthenticationLog, Employee).outerjoin(Employee)
+    if 'employee_id' in filters:
+        query = query.where(AuthenticationLog.employee_id == filters['employee_id'])
+    if 'result' in filters:
+        query = query.where(AuthenticationLog.result == filters['result'])
+    if 'device_location' in filters:
+        query = query.where(AuthenticationLog.device_location == filters['device_location'])
+    if 'date_from' in filters:
+        query = query.where(AuthenticationLog.attempt_timestamp >= filters['date_from'])
+    if 'date_to' in filters:
+        query = query.where(AuthenticationLog.attempt_timestamp < filters['date_to'])
+    if cursor:
+        # Keyset on (attempt_timestamp, log_id): each page is an index range seek, not an OFFSET scan
+        timestamp, log_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(AuthenticationLog.attempt_timestamp, AuthenticationLog.log_id) < tuple_(timestamp, log_id)
+        )
+    return query.order_by(AuthenticationLog.attempt_timestamp.desc(), AuthenticationLog.log_id.desc())
+
+
+def logs_page(filters, cursor=None, limit=PAGE_SIZE):
+    """One page of logs and the cursor for the next page (None on the last page)"""
+    rows = db.session.execute(logs_query(filters, cursor).limit(limit + 1)).all()
+    next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _export_record(log, employee):
+    return {
+        'log_id': log.log_id,
+        'attempt_timestamp': log.attempt_timestamp.isoformat() if log.attempt_timestamp else None,
+        'employee_id': log.employee_id,
+        'employee_name': employee.full_name if employee else None,
+        'department': employee.department if employee else None,
+        'result': log.result,
+        'confidence_score': log.confidence_score,
+        'device_location': log.device_location,
+        'processing_time_ms': log.processing_time_ms,
+        'failure_reason': log.failure_reason
+    }
+
+
+def iter_log_export(filters, fmt='csv', batch_size=EXPORT_BATCH_SIZE):
+    """Yield the filtered logs as CSV or NDJSON chunks, fetching batch_size rows at a time"""
+    result = db.session.execute(logs_query(filters).execution_options(yield_per=batch_size))
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, EXPORT_COLUMNS) if fmt == 'csv' else None
+    if writer:
+        writer.writeheader()
+    try:
+        for partition in result.partitions():
+            for log, employee in partition:
+                record = _export_record(log, employee)
+                if writer:
+                    writer.writerow(record)
+                else:
+                    buffer.write(json.dumps(record) + '\n')
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            db.session.expunge_all()  # Don't let the identity map grow with the export
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        result.close()
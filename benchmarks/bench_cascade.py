@@ -0,0 +1,143 @@
+"""Throughput and miss rate of single-stage MediaPipe vs the cheap-first detector stages.
+
+Replays a synthetic kiosk stream (blocks of empty frames, a near face and a
+distant face, with sensor noise) through:
+  single   MediaPipe short-range model on every frame (the current path)
+  cascade  Haar/LBP cascade first, MediaPipe (model picked by face size) on candidates
+  scene    FaceTracker difference check: unchanged scenes reuse the last result
+
+Usage: python benchmarks/bench_cascade.py --image face.jpg --cascade haarcascade_frontalface_default.xml
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from cascade import DEFAULT_CASCADE_PATH, FaceCascade  # noqa: E402
+from detection import detect_faces  # noqa: E402
+from image_io import decode_reduced  # noqa: E402
+from tracker import FaceTracker, tracking_frame  # noqa: E402
+
+# Face height as a share of the frame height
+FACE_SIZES = {'near': 0.45, 'far': 0.15}
+# Context kept around the face when cropping the photo, as a share of the face box
+CROP_MARGIN = 0.4
+
+
+def face_crop(image, margin=CROP_MARGIN):
+    """The photo cut down to its face (plus margin) so FACE_SIZES is the face's own height"""
+    faces = detect_faces(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), 1)
+    if not faces:
+        return image
+    height, width = image.shape[:2]
+    face = faces[0]
+    x0 = max(0, int((face.xmin - margin * face.width) * width))
+    y0 = max(0, int((face.ymin - margin * face.height) * height))
+    x1 = min(width, int((face.xmin + (1 + margin) * face.width) * width))
+    y1 = min(height, int((face.ymin + (1 + margin) * face.height) * height))
+    return image[y0:y1, x0:x1]
+
+
+def kiosk_stream(face, frames, block, width=1280, height=720, seed=0):
+    """[(kind, jpeg bytes)] cycling empty / near / empty / far blocks of frames"""
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(60, 200, (height, width, 3), dtype=np.uint8), (0, 0), 25)
+    scenes = {'empty': background}
+    for kind, share in FACE_SIZES.items():
+        scale = share * (1 + 2 * CROP_MARGIN) * height / face.shape[0]
+        resized = cv2.resize(face, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        scene = background.copy()
+        top, left = (height - resized.shape[0]) // 2, (width - resized.shape[1]) // 2
+        scene[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+        scenes[kind] = scene
+    cycle = ['empty', 'near', 'empty', 'far']
+    stream = []
+    for i in range(frames):
+        kind = cycle[(i // block) % len(cycle)]
+        noisy = np.clip(scenes[kind] + rng.normal(0, 3, scenes[kind].shape), 0, 255).astype(np.uint8)
+        stream.append((kind, cv2.imencode('.jpg', noisy, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes()))
+    return stream
+
+
+def run_single(stream, max_side):
+    found, calls = [], 0
+    for _, image_bytes in stream:
+        rgb_image, _ = decode_reduced(image_bytes, max_side)
+        found.append(bool(detect_faces(rgb_image)))
+        calls += 1
+    return found, calls
+
+
+def run_cascade(stream, max_side, cascade):
+    found, calls = [], 0
+    for _, image_bytes in stream:
+        rgb_image, _ = decode_reduced(image_bytes, max_side)
+        model_selection = cascade.screen(rgb_image)
+        faces = []
+        if model_selection is not None:
+            faces = detect_faces(rgb_image, model_selection)
+            calls += 1
+        found.append(bool(faces))
+    return found, calls
+
+
+def run_scene(stream, max_side):
+    tracker = FaceTracker()
+    found, calls = [], 0
+    for _, image_bytes in stream:
+        gray = tracking_frame(image_bytes)
+        payload = tracker.lookup('kiosk', gray)
+        if payload is None:
+            rgb_image, _ = decode_reduced(image_bytes, max_side)
+            faces = detect_faces(rgb_image)
+            calls += 1
+            # Stand-in for matching: any detected face counts as a confirmed identity
+            payload = {'result': 'SUCCESS' if faces else 'FAILED'}
+            tracker.update('kiosk', gray, faces[0] if faces else None, payload)
+        found.append(payload['result'] == 'SUCCESS')
+    return found, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--image', required=True, help='Photo containing one face')
+    parser.add_argument('--cascade', default=DEFAULT_CASCADE_PATH, help='Haar/LBP cascade XML')
+    parser.add_argument('--frames', type=int, default=240)
+    parser.add_argument('--block', type=int, default=30, help='Frames per empty/near/far block')
+    parser.add_argument('--max-side', type=int, default=640)
+    args = parser.parse_args()
+
+    stream = kiosk_stream(face_crop(cv2.imread(args.image)), args.frames, args.block)
+    kinds = [kind for kind, _ in stream]
+    modes = {'single': lambda: run_single(stream, args.max_side),
+             'scene': lambda: run_scene(stream, args.max_side)}
+    if os.path.exists(args.cascade):
+        cascade = FaceCascade(args.cascade)
+        modes['cascade'] = lambda: run_cascade(stream, args.max_side, cascade)
+    else:
+        print(f'{args.cascade} not found: skipping the cascade mode (pass --cascade)')
+    detect_faces(np.zeros((64, 64, 3), dtype=np.uint8))
+    detect_faces(np.zeros((64, 64, 3), dtype=np.uint8), 1)
+
+    baseline = None
+    print(f'{"mode":<9}{"fps":>8}{"mediapipe":>11}{"near found":>12}{"far found":>11}'
+          f'{"empty hits":>12}{"missed vs single":>18}')
+    for mode, run in modes.items():
+        start = time.perf_counter()
+        found, calls = run()
+        fps = len(stream) / (time.perf_counter() - start)
+        if baseline is None:
+            baseline = found
+        rate = {kind: np.mean([hit for hit, k in zip(found, kinds) if k == kind]) for kind in ('near', 'far', 'empty')}
+        missed = sum(1 for hit, expected in zip(found, baseline) if expected and not hit)
+        print(f'{mode:<9}{fps:>8.1f}{calls:>11}{rate["near"]:>12.0%}{rate["far"]:>11.0%}'
+              f'{rate["empty"]:>12.0%}{missed / max(1, sum(baseline)):>18.1%}')
+
+
+if __name__ == '__main__':
+    main()
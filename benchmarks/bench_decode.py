@@ -0,0 +1,60 @@
+"""Per-frame decode + detection cost at full resolution vs reduced decoding for detection.
+
+Usage: python benchmarks/bench_decode.py --image face.jpg --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from detection import detect_faces  # noqa: E402
+from image_io import decode_reduced  # noqa: E402
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080), '4K': (3840, 2160)}
+
+
+def camera_frame(face, width, height):
+    """The face photo centred on a plain background, as a kiosk camera would see it"""
+    frame = np.full((height, width, 3), 120, dtype=np.uint8)
+    scale = 0.8 * height / face.shape[0]
+    face = cv2.resize(face, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    top, left = (height - face.shape[0]) // 2, (width - face.shape[1]) // 2
+    frame[top:top + face.shape[0], left:left + face.shape[1]] = face
+    return cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def measure(image_bytes, max_side, repeat):
+    decode_ms = detect_ms = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rgb_image, _ = decode_reduced(image_bytes, max_side)
+        decoded = time.perf_counter()
+        faces = detect_faces(rgb_image)
+        detect_ms += (time.perf_counter() - decoded) * 1000
+        decode_ms += (decoded - start) * 1000
+    return decode_ms / repeat, detect_ms / repeat, rgb_image.nbytes / 1e6, len(faces)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--image', required=True, help='Photo containing one face')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--max-side', type=int, default=640)
+    args = parser.parse_args()
+
+    face = cv2.imread(args.image)
+    print(f'{"frame":<8}{"mode":<10}{"decode ms":>11}{"detect ms":>11}{"frame MB":>10}{"faces":>7}')
+    for name, (width, height) in RESOLUTIONS.items():
+        image_bytes = camera_frame(face, width, height)
+        for mode, max_side in (('full', None), ('reduced', args.max_side)):
+            decode_ms, detect_ms, megabytes, faces = measure(image_bytes, max_side, args.repeat)
+            print(f'{name:<8}{mode:<10}{decode_ms:>11.1f}{detect_ms:>11.1f}{megabytes:>10.1f}{faces:>7}')
+
+
+if __name__ == '__main__':
+    main()
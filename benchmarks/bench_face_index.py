@@ -0,0 +1,73 @@
+"""Recall-versus-latency benchmark for the gallery search indexes.
+
+Usage: python benchmarks/bench_face_index.py --size 200000 --queries 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from face_index import FlatIndex, IVFIndex  # noqa: E402
+
+
+def synthetic_gallery(size, rng):
+    """Random face signatures in the same ranges MediaPipe produces"""
+    vectors = np.empty((size, 5), dtype=np.float32)
+    vectors[:, 0:2] = rng.uniform(0.1, 0.6, (size, 2))
+    vectors[:, 2:4] = rng.uniform(0.1, 0.4, (size, 2))
+    vectors[:, 4] = rng.uniform(0.5, 1.0, size)
+    return vectors
+
+
+def time_queries(index, queries):
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        ids, _ = index.search(query, k=1)
+        results.append(ids[0] if len(ids) else -1)
+    elapsed = time.perf_counter() - start
+    return np.array(results), elapsed / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=200000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--noise', type=float, default=0.005)
+    parser.add_argument('--lists', type=int, nargs='+', default=[64, 256, 1024])
+    parser.add_argument('--probes', type=int, nargs='+', default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = synthetic_gallery(args.size, rng)
+    ids = np.arange(args.size)
+    sample = rng.choice(args.size, args.queries, replace=False)
+    queries = vectors[sample] + rng.normal(0, args.noise, (args.queries, 5)).astype(np.float32)
+
+    flat = FlatIndex()
+    flat.build(ids, vectors)
+    truth, flat_ms = time_queries(flat, queries)
+    print(f'gallery={args.size} queries={args.queries}')
+    print(f'{"index":<24}{"build s":>10}{"recall@1":>10}{"ms/query":>10}')
+    print(f'{"flat":<24}{"-":>10}{1.0:>10.3f}{flat_ms:>10.3f}')
+
+    for n_lists in args.lists:
+        start = time.perf_counter()
+        ivf = IVFIndex(n_lists=n_lists)
+        ivf.build(ids, vectors)
+        build_s = time.perf_counter() - start
+        for n_probe in args.probes:
+            if n_probe > n_lists:
+                continue
+            ivf.n_probe = n_probe
+            found, ivf_ms = time_queries(ivf, queries)
+            recall = float(np.mean(found == truth))
+            print(f'{f"ivf lists={n_lists} probe={n_probe}":<24}{build_s:>10.2f}{recall:>10.3f}{ivf_ms:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Per-worker startup time and private memory: private gallery copies vs the shared snapshot.
+
+Each worker process loads the gallery, runs a few searches and reports
+its private (unshared) memory from /proc/self/smaps_rollup (Linux only),
+then applies --changes enrollments (replace one template, add one new)
+the way FaceGallery.sync does and reports it again. 'snapshot-flat' is
+the old path: a FlatIndex built on the mapped matrix, which copies it on
+the first change. Workers run with a fixed glibc mmap threshold, so freed
+per-search scratch arrays go back to the OS instead of being counted as
+private heap.
+
+Usage: python benchmarks/bench_gallery_snapshot.py --size 1000000 --workers 8 --changes 100
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from face_index import VECTOR_DIMS, FlatIndex, OverlayIndex  # noqa: E402
+from snapshot import GallerySnapshot, write_snapshot  # noqa: E402
+from bench_face_index import synthetic_gallery  # noqa: E402
+
+
+def private_mb():
+    total_kb = 0
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith(('Private_Clean:', 'Private_Dirty:')):
+                total_kb += int(line.split()[1])
+    return total_kb / 1024
+
+
+def worker(mode, path, queries, changes, results):
+    baseline = private_mb()
+    start = time.perf_counter()
+    if mode == 'copy':
+        # What every worker does without a snapshot: its own copy of the matrix
+        with np.load(path) as data:
+            index = FlatIndex()
+            index.build(data['ids'], data['vectors'])
+    else:
+        snapshot = GallerySnapshot(path)
+        if mode == 'snapshot':
+            index = OverlayIndex(snapshot.ids, snapshot.vectors)
+        else:
+            index = FlatIndex()
+            index.build(snapshot.ids, snapshot.vectors)
+    load_ms = (time.perf_counter() - start) * 1000
+    for query in queries:
+        index.search(query, k=1)
+    fresh = private_mb() - baseline
+
+    rng = np.random.default_rng(1)
+    size = len(index)
+    for change in range(changes):
+        replaced = int(rng.integers(0, size))
+        index.remove([replaced])
+        index.add([replaced, size + change], rng.random((2, VECTOR_DIMS), dtype=np.float32))
+    for query in queries:
+        index.search(query, k=1)
+    results.put((load_ms, fresh, private_mb() - baseline))
+
+
+def run(mode, path, workers, queries, changes):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = [context.Process(target=worker, args=(mode, path, queries, changes, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    measurements = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    load_ms, fresh, changed = np.mean(measurements, axis=0)
+    return load_ms, fresh, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=1000000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--changes', type=int, default=100, help='Enrollments applied before the second measurement')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = synthetic_gallery(args.size, rng)
+    ids = np.arange(args.size, dtype=np.int64)
+    queries = vectors[rng.integers(0, args.size, args.queries)]
+
+    # Spawned workers inherit this; without it glibc raises the threshold after the first large
+    # free and keeps later score arrays on the heap, hiding what the index itself retains
+    os.environ.setdefault('MALLOC_MMAP_THRESHOLD_', '131072')
+    with tempfile.TemporaryDirectory() as tmp:
+        copy_path = os.path.join(tmp, 'gallery.npz')
+        snapshot_path = os.path.join(tmp, 'gallery.snap')
+        np.savez(copy_path, ids=ids, vectors=vectors)
+        write_snapshot(snapshot_path, ids, vectors, version=0)
+
+        print(f'{"mode":<15}{"workers":>8}{"load ms":>10}{"private MB/worker":>19}'
+              f'{"after changes":>15}{"total MB":>10}')
+        for mode, path in (('copy', copy_path), ('snapshot-flat', snapshot_path), ('snapshot', snapshot_path)):
+            load_ms, fresh, changed = run(mode, path, args.workers, queries, args.changes)
+            print(f'{mode:<15}{args.workers:>8}{load_ms:>10.1f}{fresh:>19.1f}'
+                  f'{changed:>15.1f}{changed * args.workers:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
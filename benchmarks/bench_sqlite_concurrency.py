@@ -0,0 +1,118 @@
+"""Concurrent read/write benchmark: default SQLite journaling vs the tuned pragmas.
+
+Writer threads insert AuthenticationLog rows one commit at a time (the
+synchronous path), while reader threads run the dashboard/logs queries.
+
+Usage: python benchmarks/bench_sqlite_concurrency.py --writers 4 --readers 4 --seconds 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from config import DEFAULT_SQLITE_PRAGMAS, engine_options, install_sqlite_pragmas  # noqa: E402
+from models import db, Role, Employee, AuthenticationLog  # noqa: E402
+
+
+def make_engine(path, tuned):
+    uri = f'sqlite:///{path}'
+    if tuned:
+        engine = create_engine(uri, **engine_options(uri, pool_size=16, max_overflow=8, pool_timeout=30))
+        install_sqlite_pragmas(engine, DEFAULT_SQLITE_PRAGMAS)
+    else:
+        engine = create_engine(uri)
+    return engine
+
+
+def seed(engine, employees=50, logs=20000):
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Role.__table__), [{'role_name': 'Employee', 'security_level': 2}])
+        conn.execute(insert(Employee.__table__), [
+            {'role_id': 1, 'first_name': f'First{i}', 'last_name': f'Last{i}', 'email': f'user{i}@example.com'}
+            for i in range(employees)
+        ])
+        conn.execute(insert(AuthenticationLog.__table__), [
+            {'employee_id': random.randint(1, employees), 'result': random.choice(['SUCCESS', 'FAILED']),
+             'attempt_timestamp': datetime.utcnow(), 'confidence_score': 0.9}
+            for _ in range(logs)
+        ])
+
+
+def run(engine, writers, readers, seconds):
+    counts = {'writes': 0, 'reads': 0, 'errors': 0}
+    write_latencies = []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+    log_table = AuthenticationLog.__table__
+
+    def writer():
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.execute(insert(log_table), {
+                        'employee_id': random.randint(1, 50), 'result': 'SUCCESS',
+                        'attempt_timestamp': datetime.utcnow(), 'confidence_score': 0.9
+                    })
+                with lock:
+                    counts['writes'] += 1
+                    write_latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                with lock:
+                    counts['errors'] += 1
+
+    def reader():
+        while time.monotonic() < stop:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(select(func.count()).select_from(log_table)).scalar()
+                    conn.execute(select(log_table).order_by(log_table.c.log_id.desc()).limit(50)).all()
+                with lock:
+                    counts['reads'] += 1
+            except OperationalError:
+                with lock:
+                    counts['errors'] += 1
+
+    threads = [threading.Thread(target=writer) for _ in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    write_latencies.sort()
+    p99 = write_latencies[int(len(write_latencies) * 0.99) - 1] * 1000 if write_latencies else float('nan')
+    return counts, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f'{"mode":<10}{"writes/s":>10}{"reads/s":>10}{"errors":>8}{"write p99 ms":>14}')
+    for tuned in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = make_engine(os.path.join(tmp, 'bench.db'), tuned)
+            seed(engine)
+            counts, p99 = run(engine, args.writers, args.readers, args.seconds)
+            engine.dispose()
+        mode = 'tuned' if tuned else 'default'
+        print(f'{mode:<10}{counts["writes"] / args.seconds:>10.0f}{counts["reads"] / args.seconds:>10.0f}'
+              f'{counts["errors"]:>8}{p99:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
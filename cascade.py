@@ -0,0 +1,96 @@
+import os
+import threading
+
+import cv2
+
+from detection import detect_faces, detect_faces_batch
+
+# OpenCV wheels that bundle cascade files expose their directory as cv2.data.haarcascades
+DEFAULT_CASCADE_PATH = os.path.join(getattr(getattr(cv2, 'data', None), 'haarcascades', ''),
+                                    'haarcascade_frontalface_default.xml')
+# Smallest candidate, in pixels of the downscaled frame
+MIN_FACE_PX = 16
+
+
+class FaceCascade:
+    """Cheap first detection stage: a Haar or LBP cascade on a small gray copy of the frame
+
+    Frames without a candidate face never reach MediaPipe; for the rest
+    the largest candidate's height picks the short-range model (0) for
+    near faces or the full-range model (1) for distant ones.
+    """
+
+    def __init__(self, path=DEFAULT_CASCADE_PATH, max_side=256, scale_factor=1.1, min_neighbors=3,
+                 near_face_ratio=0.2):
+        self._local = threading.local()
+        self.configure(path, max_side, scale_factor, min_neighbors, near_face_ratio)
+        self.screened = 0
+        self.rejected = 0
+
+    def configure(self, path=DEFAULT_CASCADE_PATH, max_side=256, scale_factor=1.1, min_neighbors=3,
+                  near_face_ratio=0.2):
+        self.path = path
+        self.max_side = max_side
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.near_face_ratio = near_face_ratio
+
+    def settings(self):
+        """Keyword arguments that rebuild this cascade, e.g. inside a detection worker process"""
+        return {
+            'path': self.path,
+            'max_side': self.max_side,
+            'scale_factor': self.scale_factor,
+            'min_neighbors': self.min_neighbors,
+            'near_face_ratio': self.near_face_ratio
+        }
+
+    @property
+    def available(self):
+        return bool(self.path) and os.path.exists(self.path)
+
+    def _classifier(self):
+        # CascadeClassifier keeps per-call scratch state, so each thread loads its own
+        if getattr(self._local, 'path', None) != self.path:
+            classifier = cv2.CascadeClassifier(self.path)
+            if classifier.empty():
+                raise ValueError(f'{self.path} is not a cascade classifier')
+            self._local.classifier, self._local.path = classifier, self.path
+        return self._local.classifier
+
+    def screen(self, rgb_image):
+        """MediaPipe model_selection for the frame's largest candidate face, or None when there is none"""
+        scale = self.max_side / max(rgb_image.shape[:2])
+        if scale < 1:
+            rgb_image = cv2.resize(rgb_image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+        boxes = self._classifier().detectMultiScale(gray, self.scale_factor, self.min_neighbors,
+                                                    minSize=(MIN_FACE_PX, MIN_FACE_PX))
+        self.screened += 1
+        if len(boxes) == 0:
+            self.rejected += 1
+            return None
+        largest = max(height for _, _, _, height in boxes) / gray.shape[0]
+        return 0 if largest >= self.near_face_ratio else 1
+
+    def detect(self, rgb_image):
+        """Run MediaPipe (with the model the cascade picked) only on frames the cascade passes"""
+        model_selection = self.screen(rgb_image)
+        if model_selection is None:
+            return []
+        return detect_faces(rgb_image, model_selection)
+
+    def detect_batch(self, rgb_images):
+        """detect() for several frames: one detector checkout per model the cascade picked"""
+        models = [self.screen(rgb_image) for rgb_image in rgb_images]
+        faces = [[] for _ in rgb_images]
+        for model_selection in (0, 1):
+            positions = [position for position, model in enumerate(models) if model == model_selection]
+            if positions:
+                detected = detect_faces_batch([rgb_images[position] for position in positions], model_selection)
+                for position, frame_faces in zip(positions, detected):
+                    faces[position] = frame_faces
+        return faces
+
+
+face_cascade = FaceCascade()
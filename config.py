@@ -0,0 +1,71 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Applied to every new SQLite connection: WAL lets dashboard reads run while
+# authentication writes commit, and NORMAL sync is durable in WAL mode
+# except for the last transactions before a power loss
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,            # ms to wait on a locked database before SQLITE_BUSY
+    'cache_size': -64000,            # negative = KiB, so ~64 MB page cache per connection
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def engine_options(database_uri, pool_size, max_overflow, pool_timeout):
+    """SQLAlchemy engine options sized for multi-threaded serving"""
+    url = make_url(database_uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}  # In-memory SQLite uses a single shared connection
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': pool_timeout,
+    }
+    if url.get_backend_name() == 'sqlite':
+        options['connect_args'] = {'timeout': DEFAULT_SQLITE_PRAGMAS['busy_timeout'] / 1000}
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = 1800
+    return options
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def install_sqlite_pragmas(engine, pragmas=None):
+    """Run the pragmas on every connection the engine opens (no-op for other databases)"""
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = DEFAULT_SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+
+class DatabaseConfig:
+    """Database settings, overridable through the environment"""
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///facial_recognition.db')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # One connection per request thread plus headroom for the log writer
+    DB_POOL_SIZE = _env_int('DB_POOL_SIZE', 10)
+    DB_MAX_OVERFLOW = _env_int('DB_MAX_OVERFLOW', 5)
+    DB_POOL_TIMEOUT = _env_int('DB_POOL_TIMEOUT', 10)
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+        SQLALCHEMY_DATABASE_URI, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+    )
+    SQLITE_PRAGMAS = DEFAULT_SQLITE_PRAGMAS
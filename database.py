@@ -1,12 +1,19 @@
-from models import db, Role, Employee, BiometricData, AuthenticationLog
+from models import db, Role, Employee, BiometricData, AuthenticationLog, AuthenticationStats, GalleryChange
+from stats import rebuild_daily_stats
+from audit_logs import PAGE_SIZE, logs_query
+from directory import PER_PAGE, employees_query
+from face_encoding import ALGORITHM_VERSION, encode_face_vector, is_binary_encoding, parse_legacy_encoding
 from datetime import datetime, timedelta
 import random
 
 def init_database(app):
+    upgrade_schema(app)
     with app.app_context():
-        db.create_all()
         if Role.query.first() is None:
             create_sample_data()
+        # Backfill the dashboard rollup for databases created before it existed
+        if AuthenticationStats.query.first() is None and AuthenticationLog.query.first() is not None:
+            rebuild_daily_stats()
 
 def create_sample_data():
     # Create Roles
@@ -56,4 +63,127 @@ def create_sample_data():
         db.session.add(log)
     
     db.session.commit()
-    print("✅ Sample data created successfully!")
\ No newline at end of file
+    print("✅ Sample data created successfully!")
+
+def migrate_face_encodings(app, batch_size=500):
+    """Rewrite legacy str(dict) face encodings into the binary template format"""
+    migrated = skipped = 0
+    last_id = 0
+    with app.app_context():
+        while True:
+            batch = BiometricData.query.filter(
+                BiometricData.biometric_id > last_id
+            ).order_by(BiometricData.biometric_id).limit(batch_size).all()
+            if not batch:
+                break
+
+            for biometric in batch:
+                if is_binary_encoding(biometric.face_encoding):
+                    continue
+                try:
+                    vector = parse_legacy_encoding(biometric.face_encoding)
+                except Exception:
+                    skipped += 1  # Placeholder encodings have no face data
+                    continue
+                biometric.face_encoding = encode_face_vector(vector)
+                biometric.algorithm_version = ALGORITHM_VERSION
+                migrated += 1
+
+            db.session.commit()
+            last_id = batch[-1].biometric_id
+    return migrated, skipped
+
+
+def upgrade_schema(app):
+    """Create tables and indexes missing from an existing database"""
+    with app.app_context():
+        db.create_all()
+        make_log_employee_nullable()
+        created = []
+        for table in db.metadata.sorted_tables:
+            existing = existing_index_names(table.name)
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(bind=db.engine)
+                    created.append(index.name)
+        return created
+
+
+def make_log_employee_nullable():
+    """Drop NOT NULL from authentication_log.employee_id on databases created before the quality gate"""
+    columns = {column['name']: column for column in db.inspect(db.engine).get_columns('authentication_log')}
+    if columns['employee_id']['nullable']:
+        return False
+    with db.engine.begin() as connection:
+        if connection.dialect.name != 'sqlite':
+            connection.execute(db.text('ALTER TABLE authentication_log ALTER COLUMN employee_id DROP NOT NULL'))
+            return True
+        # SQLite cannot alter a column: rebuild the table from the model and copy the rows across
+        names = ', '.join(column.name for column in AuthenticationLog.__table__.columns)
+        for index in AuthenticationLog.__table__.indexes:
+            connection.execute(db.text(f'DROP INDEX IF EXISTS {index.name}'))
+        connection.execute(db.text('ALTER TABLE authentication_log RENAME TO authentication_log_old'))
+        AuthenticationLog.__table__.create(connection)
+        connection.execute(db.text(
+            f'INSERT INTO authentication_log ({names}) SELECT {names} FROM authentication_log_old'
+        ))
+        connection.execute(db.text('DROP TABLE authentication_log_old'))
+    return True
+
+
+def existing_index_names(table_name):
+    """Index names on a table, including expression indexes SQLAlchemy can't reflect on SQLite"""
+    if db.engine.dialect.name == 'sqlite':
+        rows = db.session.execute(
+            db.text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+            {'table': table_name}
+        )
+        return {name for name, in rows}
+    return {index['name'] for index in db.inspect(db.engine).get_indexes(table_name)}
+
+
+def hot_queries():
+    """The queries served on every page load, auth and enroll"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        'recent logs': AuthenticationLog.query.order_by(
+            AuthenticationLog.attempt_timestamp.desc()
+        ).limit(5),
+        'employee directory': employees_query(sort='name').limit(PER_PAGE),
+        'employees by department': employees_query(sort='department', direction='desc').limit(PER_PAGE),
+        'logs page': logs_query({}, f'{datetime.utcnow().isoformat()}_0').limit(PAGE_SIZE + 1),
+        'logs by employee': logs_query({'employee_id': 1}).limit(PAGE_SIZE + 1),
+        'logs since date': AuthenticationLog.query.filter(
+            AuthenticationLog.attempt_timestamp >= today
+        ),
+        'successful logs': AuthenticationLog.query.filter_by(result='SUCCESS'),
+        'biometric by employee': BiometricData.query.filter_by(employee_id=1, is_active=True),
+        'gallery changes': GalleryChange.query.filter(GalleryChange.version > 0).order_by(GalleryChange.version),
+        'active biometrics': BiometricData.query.with_entities(
+            BiometricData.employee_id, BiometricData.face_encoding
+        ).filter_by(is_active=True),
+    }
+
+
+def check_query_plans(app):
+    """EXPLAIN QUERY PLAN every hot query; returns {name: (ok, plan_lines)}
+
+    A query fails when SQLite plans a full table scan or a temporary
+    B-tree sort instead of walking an index.
+    """
+    results = {}
+    with app.app_context():
+        connection = db.session.connection()
+        if connection.dialect.name != 'sqlite':
+            raise RuntimeError('Query plan checks are only implemented for SQLite')
+        for name, query in hot_queries().items():
+            statement = getattr(query, 'statement', query)  # Legacy Query or 2.0 select()
+            compiled = statement.compile(dialect=connection.dialect)
+            params = tuple(compiled.params[key] for key in compiled.positiontup)
+            plan = [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled.string}', params)]
+            full_scan = any(
+                line.startswith('SCAN') and 'USING' not in line or 'TEMP B-TREE' in line
+                for line in plan
+            )
+            results[name] = (not full_scan, plan)
+    return results
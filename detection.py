@@ -0,0 +1,112 @@
+import atexit
+import os
+import queue
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+import mediapipe as mp
+import numpy as np
+
+mp_face_detection = mp.solutions.face_detection
+
+# Plain, picklable view of a MediaPipe detection (relative bounding box + score)
+DetectedFace = namedtuple('DetectedFace', 'xmin ymin width height score')
+
+
+def faces_from_results(results):
+    faces = []
+    for detection in results.detections or []:
+        bbox = detection.location_data.relative_bounding_box
+        faces.append(DetectedFace(bbox.xmin, bbox.ymin, bbox.width, bbox.height, detection.score[0]))
+    return faces
+
+
+class DetectorPool:
+    """Thread-safe pool of pre-warmed MediaPipe FaceDetection instances"""
+
+    def __init__(self, size=None, model_selection=0, min_detection_confidence=0.5):
+        self.size = size or os.cpu_count() or 1
+        self.model_selection = model_selection
+        self.min_detection_confidence = min_detection_confidence
+        self._available = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._detectors = []
+
+    @property
+    def created(self):
+        return len(self._detectors)
+
+    @property
+    def in_use(self):
+        return self.created - self._available.qsize()
+
+    def configure(self, size=None, model_selection=0, min_detection_confidence=0.5):
+        self.close()
+        self.__init__(size, model_selection, min_detection_confidence)
+
+    def _create(self):
+        detector = mp_face_detection.FaceDetection(
+            model_selection=self.model_selection,
+            min_detection_confidence=self.min_detection_confidence
+        )
+        # Run one blank frame so graph and model initialisation happen now
+        detector.process(np.zeros((64, 64, 3), dtype=np.uint8))
+        self._detectors.append(detector)
+        return detector
+
+    def start(self):
+        """Create and warm every detector up front"""
+        with self._lock:
+            while self.created < self.size:
+                self._available.put(self._create())
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """Borrow a detector for the duration of the with block"""
+        try:
+            detector = self._available.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                detector = self._create() if self.created < self.size else None
+            if detector is None:
+                detector = self._available.get(timeout=timeout)
+        try:
+            yield detector
+        finally:
+            self._available.put(detector)
+
+    def after_fork(self):
+        """Forget detectors inherited over fork() without closing them; their threads stayed in the parent"""
+        self.__init__(self.size, self.model_selection, self.min_detection_confidence)
+
+    def close(self):
+        with self._lock:
+            for detector in self._detectors:
+                detector.close()
+            self._detectors = []
+            self._available = queue.LifoQueue()
+
+
+detector_pool = DetectorPool()
+atexit.register(detector_pool.close)
+# Full-range model (faces up to ~5m away); detectors are only created if a frame asks for it
+full_range_detector_pool = DetectorPool(model_selection=1)
+os.register_at_fork(after_in_child=detector_pool.after_fork)
+os.register_at_fork(after_in_child=full_range_detector_pool.after_fork)
+atexit.register(full_range_detector_pool.close)
+
+
+def detect_faces(rgb_image, model_selection=None):
+    """Detect faces in an RGB frame with a pooled detector (model_selection 1 uses the full-range pool)"""
+    pool = full_range_detector_pool if model_selection == 1 else detector_pool
+    with pool.checkout() as face_detection:
+        results = face_detection.process(rgb_image)
+    return faces_from_results(results)
+
+
+def detect_faces_batch(rgb_images, model_selection=None):
+    """Detect faces in several frames with a single detector checkout"""
+    pool = full_range_detector_pool if model_selection == 1 else detector_pool
+    with pool.checkout() as face_detection:
+        return [faces_from_results(face_detection.process(rgb_image)) for rgb_image in rgb_images]
@@ -0,0 +1,70 @@
+from sqlalchemy import func, or_, select
+
+from models import db, Employee, Role
+
+PER_PAGE = 25
+MAX_PER_PAGE = 100
+SEARCH_COLUMNS = (Employee.first_name, Employee.last_name, Employee.email, Employee.department)
+# Each sort has a covering index (employee_id is the rowid tie-breaker)
+SORTS = {
+    'name': (Employee.last_name, Employee.first_name, Employee.employee_id),
+    'email': (Employee.email,),
+    'department': (Employee.department, Employee.employee_id),
+    'id': (Employee.employee_id,),
+}
+
+
+def search_condition(search):
+    """Case-insensitive prefix match on name, email or department, served by the lower() indexes"""
+    prefix = search.strip().lower()
+    if not prefix:
+        return None
+    # A range instead of LIKE so every database can use the expression index
+    upper = prefix + '\uffff'
+    return or_(*(func.lower(column).between(prefix, upper) for column in SEARCH_COLUMNS))
+
+
+def employees_query(search='', sort='name', direction='asc'):
+    if sort not in SORTS:
+        raise ValueError(f'sort must be one of {", ".join(SORTS)}')
+    if direction not in ('asc', 'desc'):
+        raise ValueError('dir must be asc or desc')
+    query = select(Employee, Role).join(Role)
+    condition = search_condition(search)
+    if condition is not None:
+        query = query.where(condition)
+    columns = SORTS[sort]
+    return query.order_by(*(column.desc() if direction == 'desc' else column for column in columns))
+
+
+def employee_page(search='', sort='name', direction='asc', page=1, per_page=PER_PAGE):
+    """One page of (Employee, Role) rows plus paging info"""
+    per_page = min(max(per_page, 1), MAX_PER_PAGE)
+    page = max(page, 1)
+    count_query = select(func.count()).select_from(Employee)
+    condition = search_condition(search)
+    if condition is not None:
+        count_query = count_query.where(condition)
+    total = db.session.execute(count_query).scalar()
+    rows = db.session.execute(
+        employees_query(search, sort, direction).limit(per_page).offset((page - 1) * per_page)
+    ).all()
+    return {
+        'rows': rows,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': max(1, -(-total // per_page))
+    }
+
+
+def employee_to_dict(employee, role):
+    return {
+        'employee_id': employee.employee_id,
+        'full_name': employee.full_name,
+        'email': employee.email,
+        'department': employee.department,
+        'role': role.role_name,
+        'is_active': employee.is_active,
+        'last_login': employee.last_login.isoformat() if employee.last_login else None
+    }
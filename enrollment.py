@@ -0,0 +1,171 @@
+import os
+import time
+import zipfile
+from collections import Counter
+
+from face_encoding import ALGORITHM_VERSION, encode_face_vector, signature_to_vector
+from gallery import gallery, record_gallery_changes
+from models import db, Employee, BiometricData
+from workers import detection_workers
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+BATCH_SIZE = 200
+
+
+def photo_key(relative_path):
+    """Employee key of a photo: the top-level folder for nested files, else the file name
+
+    So both 'jane@corp.com.jpg' and 'jane@corp.com/front.jpg' enroll jane@corp.com.
+    """
+    parts = relative_path.replace('\\', '/').split('/')
+    return parts[0] if len(parts) > 1 else os.path.splitext(parts[0])[0]
+
+
+def find_photos(path):
+    """[(key, (path, zip_member))] for every image in a directory tree or zip file"""
+    photos = []
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                if member.lower().endswith(IMAGE_EXTENSIONS) and not member.startswith('__MACOSX/'):
+                    photos.append((photo_key(member), (path, member)))
+    else:
+        for root, _, files in os.walk(path):
+            for name in files:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    full_path = os.path.join(root, name)
+                    photos.append((photo_key(os.path.relpath(full_path, path)), (full_path, None)))
+    photos.sort()
+    return photos
+
+
+def resolve_employees(keys):
+    """Map photo keys (employee id or email) to employee ids"""
+    ids = {int(key) for key in keys if key.isdigit()}
+    emails = {key.lower() for key in keys if '@' in key}
+    found = {}
+    if ids:
+        found.update((str(employee_id), employee_id) for employee_id in db.session.execute(
+            db.select(Employee.employee_id).where(Employee.employee_id.in_(ids))
+        ).scalars())
+    if emails:
+        found.update((email.lower(), employee_id) for email, employee_id in db.session.execute(
+            db.select(Employee.email, Employee.employee_id).where(db.func.lower(Employee.email).in_(emails))
+        ))
+    return {key: found.get(key.lower() if '@' in key else key) for key in keys}
+
+
+def upsert_biometrics(enrollments):
+    """Write {employee_id: (vector, score)} in one transaction, updating each employee's first template"""
+    existing = dict(db.session.execute(
+        db.select(BiometricData.employee_id, db.func.min(BiometricData.biometric_id))
+        .where(BiometricData.employee_id.in_(enrollments))
+        .group_by(BiometricData.employee_id)
+    ).all())
+    updates = []
+    inserts = []
+    for employee_id, (vector, score) in enrollments.items():
+        values = {
+            'face_encoding': encode_face_vector(vector),
+            'confidence_score': score,
+            'algorithm_version': ALGORITHM_VERSION
+        }
+        if employee_id in existing:
+            updates.append({'biometric_id': existing[employee_id], **values})
+        else:
+            inserts.append({'employee_id': employee_id, 'is_active': True, **values})
+    if updates:
+        db.session.execute(db.update(BiometricData), updates)
+    if inserts:
+        db.session.execute(db.insert(BiometricData), inserts)
+    record_gallery_changes(enrollments)
+    db.session.commit()
+
+    if gallery.loaded:
+        active = set(db.session.execute(
+            db.select(BiometricData.employee_id).where(
+                BiometricData.biometric_id.in_([row['biometric_id'] for row in updates]),
+                BiometricData.is_active == True
+            )
+        ).scalars()) | {row['employee_id'] for row in inserts}
+        for employee_id in active:
+            gallery.upsert(employee_id, enrollments[employee_id][0])
+
+
+def enroll_directory(path, batch_size=BATCH_SIZE, progress=None):
+    """Detect faces in every photo under path on the process pool and enroll them
+
+    An employee with several photos is enrolled from the most confident
+    single-face photo. Templates are written batch_size employees at a time
+    as soon as all of their photos are done, so an interrupted run keeps
+    everything enrolled so far. Returns a report with throughput and
+    per-file failures.
+    """
+    started = time.perf_counter()
+    photos = find_photos(path)
+    employee_ids = resolve_employees({key for key, _ in photos})
+    failures = []
+    sources = []
+    for key, source in photos:
+        if employee_ids[key] is None:
+            failures.append({'file': _describe(source), 'error': f'no employee matches {key!r}'})
+        else:
+            sources.append((employee_ids[key], source))
+
+    best = {}
+    finished = []
+    write_seconds = 0.0
+    detect_started = time.perf_counter()
+    source_employees = {source: employee_id for employee_id, source in sources}
+    remaining = Counter(employee_id for employee_id, _ in sources)
+    for done, (source, image_shape, faces, error) in enumerate(
+            detection_workers.detect_files([source for _, source in sources]), start=1):
+        if error:
+            failures.append({'file': _describe(source), 'error': error})
+        elif not faces:
+            failures.append({'file': _describe(source), 'error': 'no face detected'})
+        elif len(faces) > 1:
+            failures.append({'file': _describe(source), 'error': f'{len(faces)} faces detected'})
+        else:
+            face = faces[0]
+            employee_id = source_employees[source]
+            if employee_id not in best or face.score > best[employee_id][1]:
+                best[employee_id] = (signature_to_vector({
+                    'bbox_x': face.xmin, 'bbox_y': face.ymin, 'bbox_width': face.width,
+                    'bbox_height': face.height, 'confidence': face.score
+                }), float(face.score))
+        employee_id = source_employees[source]
+        remaining[employee_id] -= 1
+        if remaining[employee_id] == 0 and employee_id in best:
+            finished.append(employee_id)
+        if len(finished) >= batch_size:
+            write_seconds += _write_batch(best, finished)
+        if progress and done % 100 == 0:
+            progress(done, len(sources))
+    if finished:
+        write_seconds += _write_batch(best, finished)
+    detect_seconds = time.perf_counter() - detect_started - write_seconds
+
+    elapsed = time.perf_counter() - started
+    return {
+        'photos': len(photos),
+        'detected': len(sources),
+        'enrolled': len(best),
+        'failed': len(failures),
+        'failures': failures,
+        'seconds': round(elapsed, 3),
+        'photos_per_second': round(len(sources) / detect_seconds, 1) if detect_seconds else 0.0
+    }
+
+
+def _write_batch(best, finished):
+    """Upsert the finished employees' templates and empty the list; returns the seconds spent"""
+    started = time.perf_counter()
+    upsert_biometrics({employee_id: best[employee_id] for employee_id in finished})
+    finished.clear()
+    return time.perf_counter() - started
+
+
+def _describe(source):
+    path, member = source
+    return f'{path}:{member}' if member else path
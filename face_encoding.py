@@ -0,0 +1,53 @@
+import ast
+import struct
+
+import numpy as np
+
+# Order of the values in a face signature; the first four are used for matching
+SIGNATURE_FIELDS = ('bbox_x', 'bbox_y', 'bbox_width', 'bbox_height', 'confidence')
+
+# Binary layout: 8-byte header (magic, format version, dtype code, value count)
+# followed by packed little-endian float32 values
+MAGIC = b'FSIG'
+FORMAT_VERSION = 1
+DTYPE_FLOAT32 = 1
+HEADER = struct.Struct('<4sBBH')
+ALGORITHM_VERSION = f'MediaPipe_v1.0+FSIG{FORMAT_VERSION}'
+
+
+def signature_to_vector(face_signature):
+    """Convert a face signature dict into a float32 feature vector"""
+    return np.array([face_signature[field] for field in SIGNATURE_FIELDS], dtype=np.float32)
+
+
+def encode_face_vector(vector):
+    """Pack a feature vector into the versioned binary template format"""
+    values = np.asarray(vector, dtype='<f4').ravel()
+    return HEADER.pack(MAGIC, FORMAT_VERSION, DTYPE_FLOAT32, len(values)) + values.tobytes()
+
+
+def is_binary_encoding(face_encoding):
+    return face_encoding is not None and face_encoding[:len(MAGIC)] == MAGIC
+
+
+def decode_face_vector(face_encoding):
+    """Zero-copy view of the float32 values in a binary template"""
+    magic, version, dtype_code, count = HEADER.unpack_from(face_encoding)
+    if magic != MAGIC or version != FORMAT_VERSION or dtype_code != DTYPE_FLOAT32:
+        raise ValueError('Unsupported face encoding format')
+    return np.frombuffer(face_encoding, dtype='<f4', count=count, offset=HEADER.size)
+
+
+def parse_legacy_encoding(face_encoding):
+    """Parse the old str(dict) encoding without eval()"""
+    return signature_to_vector(ast.literal_eval(face_encoding.decode()))
+
+
+def parse_face_encoding(face_encoding):
+    """Parse a stored face encoding into a feature vector (None if unusable)"""
+    try:
+        if is_binary_encoding(face_encoding):
+            return decode_face_vector(face_encoding)
+        return parse_legacy_encoding(face_encoding)
+    except Exception:
+        return None  # Placeholder or corrupted data
@@ -0,0 +1,380 @@
+import os
+
+import numpy as np
+
+from face_encoding import SIGNATURE_FIELDS
+
+MATCH_DIMS = 4
+VECTOR_DIMS = len(SIGNATURE_FIELDS)
+
+
+def similarity_scores(matrix, probe):
+    """Similarity of probe to every gallery row: 1 - 2 x the L1 distance of the bounding box fields, floored at 0"""
+    total_diff = np.abs(matrix[:, :MATCH_DIMS] - probe[:MATCH_DIMS]).sum(axis=1)
+    return np.maximum(0.0, 1.0 - total_diff * 2)
+
+
+def best_per_probe(ids, vectors, probes, chunk_elements=1 << 22, excluded=None):
+    """Best (id, score) for every probe row, scoring the whole matrix at once
+
+    The gallery is processed in chunks so the probes x gallery x dims
+    difference tensor stays bounded in memory. Rows at the sorted
+    positions in excluded are never returned.
+    """
+    best_ids = np.full(len(probes), -1, dtype=np.int64)
+    best_scores = np.zeros(len(probes), dtype=np.float32)
+    if len(ids) == 0 or len(probes) == 0:
+        return best_ids, best_scores
+
+    probes = probes[:, None, :MATCH_DIMS]
+    chunk_size = max(1, chunk_elements // (len(probes) * MATCH_DIMS))
+    for start in range(0, len(ids), chunk_size):
+        chunk = vectors[start:start + chunk_size, :MATCH_DIMS]
+        scores = np.maximum(0.0, 1.0 - np.abs(chunk[None, :, :] - probes).sum(axis=2) * 2)
+        if excluded is not None:
+            low, high = np.searchsorted(excluded, [start, start + chunk_size])
+            scores[:, excluded[low:high] - start] = -1.0
+        columns = np.argmax(scores, axis=1)
+        chunk_best = scores[np.arange(len(probes)), columns]
+        improved = chunk_best > best_scores
+        best_scores[improved] = chunk_best[improved]
+        best_ids[improved] = ids[start + columns[improved]]
+    return best_ids, best_scores
+
+
+def top_k(ids, scores, k):
+    """Return the k best (ids, scores), highest score first"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    order = candidates[np.argsort(-scores[candidates], kind='stable')]
+    return ids[order], scores[order]
+
+
+def _as_arrays(ids, vectors):
+    ids = np.asarray(ids, dtype=np.int64).ravel()
+    vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), VECTOR_DIMS)
+    return ids, vectors
+
+
+class FlatIndex:
+    """Exact brute-force search over one contiguous matrix
+
+    ids and vectors live in one (ids, vectors) tuple that writers replace
+    in a single assignment, so a search running during an add or remove
+    always scores a matching pair and never pairs new vectors with old ids.
+    """
+
+    kind = 'flat'
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self):
+        return len(self._data[0])
+
+    @property
+    def ids(self):
+        return self._data[0]
+
+    @property
+    def vectors(self):
+        return self._data[1]
+
+    def clear(self):
+        self._data = (np.empty(0, dtype=np.int64), np.empty((0, VECTOR_DIMS), dtype=np.float32))
+
+    def build(self, ids, vectors):
+        ids, vectors = _as_arrays(ids, vectors)
+        self._data = (ids, np.ascontiguousarray(vectors))
+
+    def add(self, ids, vectors):
+        ids, vectors = _as_arrays(ids, vectors)
+        current_ids, current_vectors = self._data
+        self._data = (np.concatenate([current_ids, ids]),
+                      np.ascontiguousarray(np.vstack([current_vectors, vectors])))
+
+    def remove(self, ids):
+        current_ids, current_vectors = self._data
+        keep = ~np.isin(current_ids, np.asarray(ids, dtype=np.int64))
+        if not keep.all():
+            self._data = (current_ids[keep], np.ascontiguousarray(current_vectors[keep]))
+
+    def search(self, probe, k=1):
+        ids, vectors = self._data
+        if len(ids) == 0:
+            return ids, np.empty(0, dtype=np.float32)
+        return top_k(ids, similarity_scores(vectors, probe), k)
+
+    def search_batch(self, probes):
+        """Best (ids, scores) for a matrix of probes in a single pass"""
+        ids, vectors = self._data
+        return best_per_probe(ids, vectors, np.asarray(probes, dtype=np.float32).reshape(-1, VECTOR_DIMS))
+
+    def _state(self):
+        ids, vectors = self._data
+        return {'ids': ids, 'vectors': vectors}
+
+    def _restore(self, state):
+        self.build(state['ids'], state['vectors'])
+
+    def save(self, path):
+        """Atomically write the index to disk"""
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, kind=np.array(self.kind), **self._state())
+        os.replace(tmp_path, path)
+
+
+class IVFIndex(FlatIndex):
+    """Inverted-file index: k-means coarse quantizer with n_probe lists searched per query
+
+    Each inverted list is an (ids, vectors) tuple replaced in one
+    assignment, for the same reason as FlatIndex._data.
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, n_lists=64, n_probe=8, train_iters=10, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_iters = train_iters
+        self.seed = seed
+        self.centroids = None
+        # Gallery size the quantizer was fitted on (0 if unknown, e.g. an index saved before this was kept)
+        self.trained_size = 0
+        super().__init__()
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def clear(self):
+        """Drop every vector but keep the trained quantizer"""
+        super().clear()
+        self.lists = []
+        if self.trained:
+            self._reset_lists()
+
+    def _reset_lists(self):
+        self.lists = [
+            (np.empty(0, dtype=np.int64), np.empty((0, VECTOR_DIMS), dtype=np.float32))
+            for _ in range(len(self.centroids))
+        ]
+
+    def __len__(self):
+        return len(self.ids) + sum(len(ids) for ids, _ in self.lists)
+
+    def train(self, vectors, max_samples_per_list=256):
+        """Fit the coarse quantizer with Lloyd's k-means on the matching dimensions"""
+        rng = np.random.default_rng(self.seed)
+        points = np.asarray(vectors, dtype=np.float32)[:, :MATCH_DIMS]
+        if len(points) > self.n_lists * max_samples_per_list:
+            points = points[rng.choice(len(points), self.n_lists * max_samples_per_list, replace=False)]
+        n_lists = min(self.n_lists, len(points))
+        centroids = points[rng.choice(len(points), n_lists, replace=False)].copy()
+
+        for _ in range(self.train_iters):
+            assignment = self._assign(points, centroids)
+            counts = np.bincount(assignment, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, points)
+            non_empty = counts > 0
+            centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+
+        self.centroids = np.ascontiguousarray(centroids)
+        self.trained_size = len(vectors)
+        self._reset_lists()
+
+    def needs_retraining(self, growth=2.0, max_imbalance=10.0):
+        """True once the index holds growth x the vectors the quantizer saw, or one list is far too long
+
+        A quantizer fitted on the first few templates stays in use as the
+        gallery grows; its lists then fill unevenly and recall drops.
+        """
+        if not self.trained:
+            return False
+        if len(self) > growth * max(self.trained_size, self.n_lists):
+            return True
+        sizes = np.array([len(ids) for ids, _ in self.lists])
+        return sizes.sum() > 0 and sizes.max() > max_imbalance * max(np.median(sizes), 1.0)
+
+    def retrain(self):
+        """Refit the quantizer on everything currently indexed and reassign every vector"""
+        lists = self.lists
+        ids = np.concatenate([self.ids] + [list_ids for list_ids, _ in lists])
+        vectors = np.concatenate([self.vectors] + [list_vectors for _, list_vectors in lists])
+        self.centroids = None
+        self.build(ids, vectors)
+
+    @staticmethod
+    def _assign(points, centroids, chunk_size=65536):
+        assignment = np.empty(len(points), dtype=np.int64)
+        centroid_norms = (centroids ** 2).sum(axis=1)
+        for start in range(0, len(points), chunk_size):
+            chunk = points[start:start + chunk_size]
+            distances = centroid_norms - 2 * chunk @ centroids.T
+            assignment[start:start + chunk_size] = np.argmin(distances, axis=1)
+        return assignment
+
+    def build(self, ids, vectors):
+        ids, vectors = _as_arrays(ids, vectors)
+        self.clear()
+        if not self.trained and len(ids) >= self.n_lists:
+            self.train(vectors)
+        self.add(ids, vectors)
+
+    def add(self, ids, vectors):
+        if not self.trained:
+            # Too few vectors to train yet: keep them in the exact fallback matrix
+            return super().add(ids, vectors)
+
+        ids, vectors = _as_arrays(ids, vectors)
+        assignment = self._assign(vectors[:, :MATCH_DIMS], self.centroids)
+        for list_no in np.unique(assignment):
+            rows = assignment == list_no
+            list_ids, list_vectors = self.lists[list_no]
+            self.lists[list_no] = (np.concatenate([list_ids, ids[rows]]), np.vstack([list_vectors, vectors[rows]]))
+
+    def remove(self, ids):
+        super().remove(ids)
+        ids = np.asarray(ids, dtype=np.int64)
+        for list_no, (list_ids, list_vectors) in enumerate(self.lists):
+            keep = ~np.isin(list_ids, ids)
+            if not keep.all():
+                self.lists[list_no] = (list_ids[keep], list_vectors[keep])
+
+    def search(self, probe, k=1):
+        probe = np.asarray(probe, dtype=np.float32)
+        flat_ids, flat_vectors = self._data
+        ids, vectors = [flat_ids], [flat_vectors]
+        centroids, lists = self.centroids, self.lists
+        # (Re)training swaps centroids and lists one after the other; skip the lists until they agree
+        if centroids is not None and len(lists) == len(centroids):
+            distances = np.abs(centroids - probe[:MATCH_DIMS]).sum(axis=1)
+            n_probe = min(self.n_probe, len(centroids))
+            for list_no in np.argpartition(distances, n_probe - 1)[:n_probe]:
+                list_ids, list_vectors = lists[list_no]
+                ids.append(list_ids)
+                vectors.append(list_vectors)
+
+        ids, vectors = np.concatenate(ids), np.concatenate(vectors)
+        if len(ids) == 0:
+            return ids, np.empty(0, dtype=np.float32)
+        return top_k(ids, similarity_scores(vectors, probe), k)
+
+    def search_batch(self, probes):
+        # Each probe visits different inverted lists, so search them one by one
+        best_ids, best_scores = [], []
+        for probe in np.asarray(probes, dtype=np.float32).reshape(-1, VECTOR_DIMS):
+            ids, scores = self.search(probe, k=1)
+            best_ids.append(ids[0] if len(ids) else -1)
+            best_scores.append(scores[0] if len(ids) else 0.0)
+        return np.array(best_ids, dtype=np.int64), np.array(best_scores, dtype=np.float32)
+
+    def _state(self):
+        state = {
+            'params': np.array([self.n_lists, self.n_probe, self.train_iters, self.seed, self.trained_size]),
+            'ids': self.ids,
+            'vectors': self.vectors,
+        }
+        if self.trained:
+            lists = self.lists
+            state['centroids'] = self.centroids
+            state['list_sizes'] = np.array([len(ids) for ids, _ in lists])
+            state['list_ids'] = np.concatenate([ids for ids, _ in lists])
+            state['list_vectors'] = np.concatenate([vectors for _, vectors in lists])
+        return state
+
+    def _restore(self, state):
+        self.n_lists, self.n_probe, self.train_iters, self.seed = (int(v) for v in state['params'][:4])
+        self.trained_size = int(state['params'][4]) if len(state['params']) > 4 else 0
+        self.centroids = state['centroids'] if 'centroids' in state else None
+        self.clear()
+        super().add(state['ids'], state['vectors'])
+        if self.trained:
+            bounds = np.cumsum(state['list_sizes'])[:-1]
+            self.lists = list(zip(np.split(state['list_ids'], bounds), np.split(state['list_vectors'], bounds)))
+
+
+class OverlayIndex:
+    """Exact search over a read-only base matrix plus a small private overlay of changes
+
+    The base (normally a mapped GallerySnapshot) is never written or
+    copied: removed or replaced base rows are recorded as tombstones that
+    every search masks out, and added vectors go to a delta matrix. Workers
+    mapping the same snapshot therefore keep sharing its pages however many
+    changes they apply; overlay_size tells the owner when to rebuild the base.
+    """
+
+    kind = 'flat'
+
+    def __init__(self, base_ids, base_vectors):
+        self.base_ids = base_ids
+        self.base_vectors = base_vectors
+        # (sorted tombstoned base positions, delta ids, delta vectors), replaced in one assignment
+        self._overlay = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                         np.empty((0, VECTOR_DIMS), dtype=np.float32))
+
+    def __len__(self):
+        tombstones, delta_ids, _ = self._overlay
+        return len(self.base_ids) - len(tombstones) + len(delta_ids)
+
+    @property
+    def overlay_size(self):
+        """Tombstones plus delta rows applied on top of the base"""
+        tombstones, delta_ids, _ = self._overlay
+        return len(tombstones) + len(delta_ids)
+
+    def add(self, ids, vectors):
+        ids, vectors = _as_arrays(ids, vectors)
+        tombstones, delta_ids, delta_vectors = self._overlay
+        self._overlay = (tombstones, np.concatenate([delta_ids, ids]), np.vstack([delta_vectors, vectors]))
+
+    def remove(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        tombstones, delta_ids, delta_vectors = self._overlay
+        dead = np.flatnonzero(np.isin(self.base_ids, ids))
+        keep = ~np.isin(delta_ids, ids)
+        if len(np.setdiff1d(dead, tombstones)) or not keep.all():
+            self._overlay = (np.union1d(tombstones, dead), delta_ids[keep], delta_vectors[keep])
+
+    def search(self, probe, k=1):
+        tombstones, delta_ids, delta_vectors = self._overlay
+        scores = similarity_scores(self.base_vectors, probe)
+        scores[tombstones] = -1.0
+        base_ids, base_scores = top_k(self.base_ids, scores, k)
+        live = base_scores >= 0
+        delta_top_ids, delta_scores = top_k(delta_ids, similarity_scores(delta_vectors, probe), k)
+        return top_k(np.concatenate([base_ids[live], delta_top_ids]),
+                     np.concatenate([base_scores[live], delta_scores]), k)
+
+    def search_batch(self, probes):
+        """Best (ids, scores) for a matrix of probes: the masked base, then the delta"""
+        tombstones, delta_ids, delta_vectors = self._overlay
+        probes = np.asarray(probes, dtype=np.float32).reshape(-1, VECTOR_DIMS)
+        best_ids, best_scores = best_per_probe(self.base_ids, self.base_vectors, probes, excluded=tombstones)
+        delta_best_ids, delta_best_scores = best_per_probe(delta_ids, delta_vectors, probes)
+        improved = delta_best_scores > best_scores
+        best_ids[improved] = delta_best_ids[improved]
+        best_scores[improved] = delta_best_scores[improved]
+        return best_ids, best_scores
+
+
+INDEX_TYPES = {'flat': FlatIndex, 'ivf': IVFIndex}
+
+
+def create_index(kind='flat', **params):
+    if kind not in INDEX_TYPES:
+        raise ValueError(f'Unknown face index type: {kind}')
+    return INDEX_TYPES[kind](**params)
+
+
+def load_index(path):
+    """Load an index written by save()"""
+    with np.load(path) as data:
+        state = {key: data[key] for key in data.files}
+    index = create_index(str(state.pop('kind')))
+    index._restore(state)
+    return index
@@ -0,0 +1,229 @@
+import fcntl
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from face_encoding import parse_face_encoding
+from face_index import VECTOR_DIMS, OverlayIndex, create_index, load_index
+from models import db, BiometricData, GalleryChange
+from snapshot import GallerySnapshot, write_snapshot
+
+
+def record_gallery_changes(employee_ids):
+    """Add change-feed rows to the caller's transaction, so they commit with the BiometricData writes"""
+    now = datetime.utcnow()
+    db.session.execute(db.insert(GalleryChange), [
+        {'employee_id': int(employee_id), 'changed_at': now} for employee_id in set(employee_ids)
+    ])
+
+
+def current_gallery_version():
+    return db.session.execute(db.select(db.func.max(GalleryChange.version))).scalar() or 0
+
+
+def active_templates(employee_ids=None):
+    """[(employee_id, vector)] of active, parseable templates, optionally for some employees only"""
+    query = db.select(BiometricData.employee_id, BiometricData.face_encoding).where(BiometricData.is_active == True)
+    if employee_ids is not None:
+        query = query.where(BiometricData.employee_id.in_(employee_ids))
+    templates = []
+    for employee_id, face_encoding in db.session.execute(query):
+        vector = parse_face_encoding(face_encoding)
+        if vector is not None:
+            templates.append((employee_id, vector))
+    return templates
+
+
+def build_snapshot(path):
+    """Write the active gallery to a snapshot file for workers to map; returns (templates, version)"""
+    # Version first, as in FaceGallery.load: later changes are replayed on top by sync()
+    version = current_gallery_version()
+    templates = active_templates()
+    write_snapshot(path, [employee_id for employee_id, _ in templates],
+                   [vector for _, vector in templates], version)
+    return len(templates), version
+
+
+class FaceGallery:
+    """In-memory index of every active face template used for 1:N matching"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.index_kind = 'flat'
+        self.index_params = {}
+        self.index_path = None
+        self.sync_interval = 2.0
+        self.snapshot_path = None
+        self.snapshot_rebuild_rows = 1024
+        self.snapshot = None
+        self.index = create_index(self.index_kind)
+        self.loaded = False
+        self.version = 0
+        # Bumped on every change to the index contents, including this worker's own upserts
+        self.generation = 0
+        self._last_sync = 0.0
+
+    def __len__(self):
+        return len(self.index)
+
+    def configure(self, index_kind='flat', index_params=None, index_path=None, sync_interval=2.0,
+                  snapshot_path=None, snapshot_rebuild_rows=1024):
+        self.index_kind = index_kind
+        self.index_params = index_params or {}
+        self.index_path = index_path
+        self.sync_interval = sync_interval
+        self.snapshot_path = snapshot_path
+        self.snapshot_rebuild_rows = snapshot_rebuild_rows
+        self.loaded = False
+
+    def _new_index(self):
+        # Reuse a saved index so an IVF quantizer does not need retraining on every start
+        if self.index_path and os.path.exists(self.index_path):
+            index = load_index(self.index_path)
+            if index.kind == self.index_kind:
+                return index, True
+        return create_index(self.index_kind, **self.index_params), False
+
+    def _build_index(self, employee_ids, vectors):
+        """A new index holding the given templates, retraining a reused quantizer the gallery has outgrown"""
+        index, from_disk = self._new_index()
+        trained = getattr(index, 'trained', None)
+        index.build(employee_ids, vectors)
+        if from_disk and getattr(index, 'needs_retraining', lambda: False)():
+            index.retrain()
+            trained = None
+        # Save a new quantizer so later starts reuse it
+        if self.index_path and (not from_disk or getattr(index, 'trained', None) != trained):
+            index.save(self.index_path)
+        return index
+
+    def load(self):
+        """(Re)build the gallery index from the snapshot file, or from active BiometricData rows"""
+        if self.snapshot_path:
+            return self.load_snapshot()
+        # Read the version first: changes committed during the load are replayed by the next sync
+        version = current_gallery_version()
+        templates = active_templates()
+        employee_ids = [employee_id for employee_id, _ in templates]
+        vectors = [vector for _, vector in templates]
+
+        index = self._build_index(employee_ids, np.array(vectors, dtype=np.float32).reshape(-1, VECTOR_DIMS))
+        self._install(index, version)
+
+    def load_snapshot(self):
+        """Map the shared snapshot (building it on first start) and catch up from the change feed
+
+        A flat index searches the mapped pages directly and keeps later
+        changes in a private OverlayIndex, so every worker shares one copy
+        of the matrix through the page cache; rebuild_snapshot folds the
+        overlay back in once it grows past snapshot_rebuild_rows.
+        """
+        if not os.path.exists(self.snapshot_path):
+            build_snapshot(self.snapshot_path)
+        snapshot = GallerySnapshot(self.snapshot_path)
+        if self.index_kind == 'flat':
+            index = OverlayIndex(snapshot.ids, snapshot.vectors)
+        else:
+            index = self._build_index(snapshot.ids, snapshot.vectors)
+        self._install(index, snapshot.version, snapshot)
+        self.sync()
+
+    def _install(self, index, version, snapshot=None):
+        with self._lock:
+            self.index = index
+            self.version = version
+            self.snapshot = snapshot
+            self.loaded = True
+            self.generation += 1
+            self._last_sync = time.monotonic()
+
+    def ensure_loaded(self):
+        """Load on first use, then pick up other workers' changes at most every sync_interval seconds"""
+        if not self.loaded:
+            self.load()
+        elif time.monotonic() - self._last_sync >= self.sync_interval:
+            if self.snapshot is not None and not self.snapshot.is_current():
+                self.load_snapshot()  # A newer snapshot was swapped in: drop our private deltas
+            else:
+                self.sync()
+                if getattr(self.index, 'overlay_size', 0) > self.snapshot_rebuild_rows:
+                    self.rebuild_snapshot()
+
+    def rebuild_snapshot(self):
+        """Write a fresh snapshot from the database and swap it in, dropping our overlay
+
+        A non-blocking lock file lets one worker rebuild while the others
+        keep serving from their overlays until they see the new file on
+        their next sync. Returns False if another worker holds the lock.
+        """
+        with open(f'{self.snapshot_path}.lock', 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            # Another worker may have swapped in a new snapshot since we mapped ours
+            if self.snapshot.is_current():
+                build_snapshot(self.snapshot_path)
+        self.load_snapshot()
+        return True
+
+    def sync(self):
+        """Apply GalleryChange rows newer than our version; returns the number of employees refreshed"""
+        if not self._sync_lock.acquire(blocking=False):
+            return 0  # Another thread is already syncing
+        try:
+            self._last_sync = time.monotonic()
+            changes = db.session.execute(
+                db.select(GalleryChange.version, GalleryChange.employee_id)
+                .where(GalleryChange.version > self.version)
+                .order_by(GalleryChange.version)
+            ).all()
+            if not changes:
+                return 0
+            # Re-read the current templates instead of replaying each change
+            changed = {employee_id for _, employee_id in changes}
+            templates = active_templates(changed)
+            with self._lock:
+                self.index.remove(list(changed))
+                if templates:
+                    self.index.add([employee_id for employee_id, _ in templates],
+                                   [vector for _, vector in templates])
+                self.version = max(self.version, changes[-1][0])
+                self.generation += 1
+            return len(changed)
+        finally:
+            self._sync_lock.release()
+
+    def upsert(self, employee_id, vector):
+        """Add or replace the template of a single employee"""
+        with self._lock:
+            self.index.remove([employee_id])
+            self.index.add([employee_id], [vector])
+            self.generation += 1
+
+    def remove(self, employee_id):
+        with self._lock:
+            self.index.remove([employee_id])
+            self.generation += 1
+
+    def best_match(self, probe, threshold=0.7):
+        """Return (employee_id, similarity) of the best match above threshold"""
+        employee_ids, scores = self.index.search(np.asarray(probe, dtype=np.float32), k=1)
+        if len(employee_ids) and scores[0] > threshold:
+            return int(employee_ids[0]), float(scores[0])
+        return None, 0.0
+
+    def best_matches(self, probes, threshold=0.7):
+        """best_match for a matrix of probes, scored against the gallery in one pass"""
+        employee_ids, scores = self.index.search_batch(probes)
+        return [
+            (int(employee_id), float(score)) if employee_id >= 0 and score > threshold else (None, 0.0)
+            for employee_id, score in zip(employee_ids, scores)
+        ]
+
+
+gallery = FaceGallery()
@@ -0,0 +1,174 @@
+import base64
+import struct
+
+import cv2
+import numpy as np
+
+# OpenCV >= 4.10 can decode straight to RGB; older builds convert in place
+IMREAD_COLOR_RGB = getattr(cv2, 'IMREAD_COLOR_RGB', None)
+
+
+# libjpeg can decode straight to 1/2, 1/4 or 1/8 size, skipping most of the IDCT work
+REDUCED_COLOR = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+# JPEG start-of-frame markers (baseline, progressive, ...) that carry the image size
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def decode_image(image_bytes):
+    """Decode JPEG/PNG bytes into an RGB ndarray with a single decode"""
+    buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+    if IMREAD_COLOR_RGB is not None:
+        image = cv2.imdecode(buffer, IMREAD_COLOR_RGB)
+    else:
+        image = cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+        if image is not None:
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+    if image is None:
+        raise ValueError('Could not decode image')
+    return image
+
+
+def exif_orientation(segment):
+    """EXIF Orientation tag (1-8) from an APP1 segment's payload; 1 when absent"""
+    if bytes(segment[:6]) != b'Exif\0\0' or len(segment) < 14:
+        return 1
+    tiff = bytes(segment[6:])
+    order = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if order is None:
+        return 1
+    offset = struct.unpack(order + 'I', tiff[4:8])[0]
+    if offset + 2 > len(tiff):
+        return 1
+    count = struct.unpack(order + 'H', tiff[offset:offset + 2])[0]
+    for entry in range(offset + 2, min(offset + 2 + 12 * count, len(tiff) - 11), 12):
+        tag, _, _, value = struct.unpack(order + 'HHIH', tiff[entry:entry + 10])
+        if tag == 0x0112:
+            return value
+    return 1
+
+
+def image_size(image_bytes):
+    """(height, width) of the image as OpenCV decodes it, read from a JPEG or PNG header, or None
+
+    OpenCV applies the EXIF orientation when decoding, so JPEGs tagged as
+    rotated by 90 degrees (orientations 5-8) report their SOF size swapped.
+    """
+    data = memoryview(image_bytes).cast('B')
+    if bytes(data[:8]) == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        width, height = struct.unpack('>II', data[16:24])
+        return height, width
+    if bytes(data[:2]) != b'\xff\xd8':
+        return None
+    position = 2
+    orientation = 1
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:  # Fill byte
+            position += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # Markers without a length
+            position += 2
+            continue
+        length = (data[position + 2] << 8) | data[position + 3]
+        if marker == 0xE1:  # APP1, where EXIF lives; always ahead of the SOF
+            orientation = exif_orientation(data[position + 4:position + 2 + length])
+        if marker in JPEG_SOF_MARKERS and position + 9 <= len(data):
+            height, width = struct.unpack('>HH', data[position + 5:position + 9])
+            return (width, height) if orientation in (5, 6, 7, 8) else (height, width)
+        position += 2 + length
+    return None
+
+
+def decode_reduced(image_bytes, max_side=None):
+    """Decode so the longer side is at most max_side, using libjpeg's reduced decoding when possible
+
+    Returns (rgb_image, full_shape) where full_shape is the (height, width, 3)
+    of the source image. Without max_side the frame is decoded at full size.
+    """
+    size = image_size(image_bytes) if max_side else None
+    if size is None or max(size) <= max_side:
+        image = decode_image(image_bytes)
+        full_shape = image.shape
+    else:
+        full_shape = (*size, 3)
+        buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+        factor, flags = next(
+            ((factor, flags) for factor, flags in REDUCED_COLOR if max(size) // factor >= max_side),
+            (1, None)
+        )
+        if flags is None:
+            image = decode_image(image_bytes)
+        else:
+            # Reduced modes only decode to BGR
+            image = cv2.imdecode(buffer, flags)
+            if image is None:
+                raise ValueError('Could not decode image')
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+    scale = max_side / max(image.shape[:2]) if max_side else 1
+    if scale < 1:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return image, full_shape
+
+
+class DecodedFrame:
+    """Encoded frame plus its source shape; full resolution is decoded only when a crop needs it
+
+    rgb holds the detection-resolution image when it was decoded in this
+    process (it is None for frames detected on the worker pool).
+    """
+
+    def __init__(self, image_bytes, shape, rgb=None):
+        self.image_bytes = image_bytes
+        self.shape = shape
+        self.rgb = rgb
+        self._full = rgb if rgb is not None and rgb.shape == shape else None
+
+    @classmethod
+    def decode(cls, image_bytes, max_side=None):
+        rgb, shape = decode_reduced(image_bytes, max_side)
+        return cls(image_bytes, shape, rgb)
+
+    @property
+    def full_resolution(self):
+        if self._full is None:
+            self._full = decode_image(self.image_bytes)
+        return self._full
+
+    def crop(self, face, margin=0.2):
+        """Full-resolution region around a detected face (relative bbox), with margin on every side"""
+        height, width = self.shape[:2]
+        x0 = max(0, int((face.xmin - face.width * margin) * width))
+        y0 = max(0, int((face.ymin - face.height * margin) * height))
+        x1 = min(width, int((face.xmin + face.width * (1 + margin)) * width))
+        y1 = min(height, int((face.ymin + face.height * (1 + margin)) * height))
+        return self.full_resolution[y0:y1, x0:x1]
+
+
+def decode_data_url(data_url):
+    """Return the raw bytes of a base64 data URL"""
+    return base64.b64decode(data_url.split(',', 1)[1])
+
+
+def read_request_image(request, field='image'):
+    """Raw image bytes from a JSON data URL, a multipart upload or a binary body"""
+    if request.is_json:
+        return decode_data_url(request.json.get('image_data'))
+    if request.files:
+        return request.files[field].read()
+    return request.get_data()
+
+
+def read_request_images(request, field='images'):
+    """Raw bytes of every image in a JSON list of data URLs or a multipart upload"""
+    if request.is_json:
+        return [decode_data_url(data_url) for data_url in request.json.get(field, [])]
+    return [upload.read() for upload in request.files.getlist(field)]
+
+
+def read_request_value(request, name):
+    """A scalar parameter from the JSON body, form fields or query string"""
+    if request.is_json:
+        return request.json.get(name)
+    return request.values.get(name)
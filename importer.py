@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+import random
+
+from sqlalchemy.exc import IntegrityError
+
+from gallery import record_gallery_changes
+from models import db, Role, Employee, BiometricData
+
+CHUNK_SIZE = 500
+REQUIRED_FIELDS = ('first_name', 'last_name', 'email')
+
+
+def placeholder_biometric(employee_id, first_name):
+    """BiometricData row created with every new employee until a real face is enrolled"""
+    return {
+        'employee_id': employee_id,
+        'face_encoding': f'ENCODING_{first_name}'.encode(),
+        'confidence_score': round(random.uniform(0.85, 0.95), 2),
+        'algorithm_version': 'FaceNet_v1.0'
+    }
+
+
+def read_import_rows(text, fmt='csv'):
+    """Parse a CSV (with a header row) or JSON list of employee objects
+
+    Elements of a JSON list that are not objects are passed through and
+    reported as row errors by import_employees.
+    """
+    if fmt == 'json':
+        rows = json.loads(text)
+        if isinstance(rows, dict):
+            rows = rows.get('employees', [])
+        if not isinstance(rows, list):
+            raise ValueError('JSON import must be a list of employee objects')
+        return rows
+    if fmt == 'csv':
+        return list(csv.DictReader(io.StringIO(text)))
+    raise ValueError('format must be csv or json')
+
+
+def _validate(row, roles_by_name, role_ids):
+    """Normalise one input row into Employee column values, or raise ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError('row must be an employee object')
+    values = {name: str(row.get(name) or '').strip() for name in REQUIRED_FIELDS}
+    missing = [name for name, value in values.items() if not value]
+    if missing:
+        raise ValueError(f'missing {", ".join(missing)}')
+    values['email'] = values['email'].lower()
+    if '@' not in values['email']:
+        raise ValueError(f'invalid email {values["email"]!r}')
+    if len(values['first_name']) > 50 or len(values['last_name']) > 50 or len(values['email']) > 100:
+        raise ValueError('name or email too long')
+
+    role_name = str(row.get('role') or row.get('role_name') or '').strip()
+    if role_name:
+        role_id = roles_by_name.get(role_name.lower())
+        if role_id is None:
+            raise ValueError(f'unknown role {role_name!r}')
+    elif row.get('role_id'):
+        role_id = row['role_id']
+        # bool is an int subclass and int() truncates floats, so accept only ints and digit strings
+        if isinstance(role_id, bool) or not (isinstance(role_id, int) or str(role_id).strip().isdigit()):
+            raise ValueError('role_id must be an integer')
+        role_id = int(role_id)
+        if role_id not in role_ids:
+            raise ValueError(f'unknown role_id {role_id}')
+    else:
+        raise ValueError('missing role')
+    values['role_id'] = role_id
+    values['department'] = str(row.get('department') or '').strip()[:50] or None
+    return values
+
+
+def _insert_chunk(chunk):
+    """Insert employees and their placeholder biometrics; returns the new employee ids"""
+    result = db.session.execute(
+        db.insert(Employee).returning(Employee.employee_id, sort_by_parameter_order=True),
+        [values for _, values in chunk]
+    )
+    employee_ids = result.scalars().all()
+    db.session.execute(db.insert(BiometricData), [
+        placeholder_biometric(employee_id, values['first_name'])
+        for employee_id, (_, values) in zip(employee_ids, chunk)
+    ])
+    record_gallery_changes(employee_ids)
+    return employee_ids
+
+
+def import_employees(rows, chunk_size=CHUNK_SIZE):
+    """Validate and bulk-insert employees, one transaction per chunk
+
+    Bad rows are reported as {'row': n, 'email': ..., 'error': ...} (n is
+    1-based) and skipped; they never abort the rest of the import.
+    """
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be at least 1')
+    roles = db.session.execute(db.select(Role.role_id, Role.role_name)).all()
+    roles_by_name = {name.lower(): role_id for role_id, name in roles}
+    role_ids = {role_id for role_id, _ in roles}
+    errors = []
+    valid = []
+    seen_emails = set()
+    for number, row in enumerate(rows, start=1):
+        try:
+            values = _validate(row, roles_by_name, role_ids)
+        except (ValueError, TypeError) as e:
+            email = row.get('email') if isinstance(row, dict) else None
+            errors.append({'row': number, 'email': email, 'error': str(e)})
+            continue
+        if values['email'] in seen_emails:
+            errors.append({'row': number, 'email': values['email'], 'error': 'duplicate email in import'})
+            continue
+        seen_emails.add(values['email'])
+        valid.append((number, values))
+
+    inserted = 0
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        existing = set(db.session.execute(
+            db.select(Employee.email).where(Employee.email.in_([values['email'] for _, values in chunk]))
+        ).scalars())
+        for number, values in chunk:
+            if values['email'] in existing:
+                errors.append({'row': number, 'email': values['email'], 'error': 'email already exists'})
+        chunk = [(number, values) for number, values in chunk if values['email'] not in existing]
+        if not chunk:
+            continue
+        try:
+            _insert_chunk(chunk)
+            db.session.commit()
+            inserted += len(chunk)
+        except IntegrityError:
+            # Lost a race with another writer: retry row by row to find the offender
+            db.session.rollback()
+            for number, values in chunk:
+                try:
+                    _insert_chunk([(number, values)])
+                    db.session.commit()
+                    inserted += 1
+                except IntegrityError as e:
+                    db.session.rollback()
+                    errors.append({'row': number, 'email': values['email'], 'error': str(e.orig)})
+
+    errors.sort(key=lambda error: error['row'])
+    return {'total': len(rows), 'inserted': inserted, 'failed': len(errors), 'errors': errors}
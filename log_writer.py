@@ -0,0 +1,179 @@
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+from models import db, Employee, AuthenticationLog
+from stats import bump_daily_stats
+
+_STOP = object()
+
+
+class LogWriter:
+    """Write-behind queue that batches AuthenticationLog inserts and last_login updates"""
+
+    def __init__(self, max_queue=10000, batch_size=200, flush_interval=0.5, enabled=True, retries=3, retry_delay=0.2):
+        self.app = None
+        self.configure(max_queue, batch_size, flush_interval, enabled, retries, retry_delay)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.overflow = 0
+        self.retried = 0
+
+    def configure(self, max_queue=10000, batch_size=200, flush_interval=0.5, enabled=True, retries=3, retry_delay=0.2):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(maxsize=max_queue)
+
+    def init_app(self, app):
+        self.app = app
+        self.configure(
+            max_queue=app.config.get('LOG_QUEUE_SIZE', 10000),
+            batch_size=app.config.get('LOG_BATCH_SIZE', 200),
+            flush_interval=app.config.get('LOG_FLUSH_INTERVAL', 0.5),
+            enabled=app.config.get('LOG_WRITE_BEHIND', True),
+            retries=app.config.get('LOG_WRITE_RETRIES', 3),
+            retry_delay=app.config.get('LOG_RETRY_DELAY', 0.2)
+        )
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            'queue_depth': self.depth,
+            'queue_capacity': self.max_queue,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'batches': self.batches,
+            'failed': self.failed,
+            'retried': self.retried,
+            'overflow': self.overflow
+        }
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                    self._thread.start()
+
+    def submit(self, **row):
+        """Queue one AuthenticationLog row (column=value); returns the row with its timestamp"""
+        row.setdefault('attempt_timestamp', datetime.utcnow())
+        self.submit_many([row])
+        return row
+
+    def submit_many(self, rows):
+        if not rows:
+            return
+        if not self.enabled:
+            self._write_now(rows)
+            return
+        self._ensure_started()
+        for row in rows:
+            try:
+                self._queue.put_nowait(row)
+                self.enqueued += 1
+            except queue.Full:
+                # Never drop audit rows: fall back to a synchronous write
+                self.overflow += 1
+                self._write_now([row])
+
+    def _write_now(self, rows):
+        """Synchronous write for the calling request; raises if any row could not be stored"""
+        failed = self._write(rows)
+        if failed:
+            raise RuntimeError(f'Failed to write {len(failed)} authentication logs')
+
+    def _run(self):
+        while True:
+            batch = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while item is not _STOP:
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            if item is _STOP:
+                return
+
+    def _write(self, rows, retries=None):
+        """Write rows, retrying transient errors; returns the rows that could not be written
+
+        A batch that still fails (e.g. "database is locked" after
+        busy_timeout on every retry, or one bad row) is written one row per
+        transaction, so a single bad row cannot lose the rest of the batch.
+        """
+        retries = self.retries if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                self._commit(rows)
+                return []
+            except OperationalError as e:
+                error = e
+                if attempt < retries:
+                    self.retried += 1
+                    time.sleep(self.retry_delay * 2 ** attempt)
+            except Exception as e:
+                error = e
+                break
+        if len(rows) > 1:
+            # Each row gets one attempt: the batch has already waited out the retries
+            return [row for single in rows for row in self._write([single], retries=0)]
+        self.failed += 1
+        self.app.logger.error(f'Failed to write authentication log {rows[0]}: {error}')
+        return rows
+
+    def _commit(self, rows):
+        """Insert rows, bump last_login for successes and update the daily rollup in one transaction"""
+        last_logins = {}
+        for row in rows:
+            if row['result'] == 'SUCCESS':
+                employee_id = row['employee_id']
+                last_logins[employee_id] = max(row['attempt_timestamp'], last_logins.get(employee_id, row['attempt_timestamp']))
+
+        with self.app.app_context():
+            try:
+                db.session.execute(db.insert(AuthenticationLog), rows)
+                if last_logins:
+                    db.session.execute(db.update(Employee), [
+                        {'employee_id': employee_id, 'last_login': timestamp}
+                        for employee_id, timestamp in last_logins.items()
+                    ])
+                bump_daily_stats(rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+        self.written += len(rows)
+        self.batches += 1
+
+    def stop(self, timeout=10):
+        """Flush everything queued and stop the writer thread"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self._thread = None
+
+
+log_writer = LogWriter()
+atexit.register(log_writer.stop)
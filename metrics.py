@@ -0,0 +1,189 @@
+import bisect
+import threading
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    metric_type = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+
+
+class Counter(Metric):
+    metric_type = 'counter'
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def labels(self, *label_values):
+        return _Bound(self, label_values)
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.label_names:
+            values = [((), 0)]
+        for label_values, value in values:
+            lines.append(f'{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}')
+        return lines
+
+
+class Gauge(Metric):
+    """Value read from a callback at scrape time, so the hot path pays nothing"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name, documentation, callback, metric_type='gauge'):
+        super().__init__(name, documentation)
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def render(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return []  # Source not available (e.g. outside an app context)
+        return self.header() + [f'{self.name} {_format_value(value)}']
+
+
+class Histogram(Metric):
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def labels(self, *label_values):
+        return _Bound(self, label_values)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            values = sorted((label_values, (list(counts), total, count))
+                            for label_values, (counts, total, count) in self._values.items())
+        for label_values, (counts, total, count) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(self.label_names, label_values, ("le", le))} {cumulative}')
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class _Bound:
+    """A metric with its label values filled in"""
+
+    def __init__(self, metric, label_values):
+        self.metric = metric
+        self.label_values = label_values
+
+    def inc(self, amount=1):
+        self.metric.inc(amount, *self.label_values)
+
+    def observe(self, value):
+        self.metric.observe(value, *self.label_values)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, callback, metric_type='gauge'):
+        return self.register(Gauge(name, documentation, callback, metric_type))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by route, method and status', ('route', 'method', 'status')
+)
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route', ('route', 'method')
+)
+auth_results = registry.counter(
+    'auth_results_total', 'Authentication outcomes by endpoint and result', ('endpoint', 'result')
+)
+db_queries = registry.counter(
+    'db_queries_total', 'SQL statements executed by statement type', ('statement',)
+)
+db_errors = registry.counter(
+    'db_query_errors_total', 'SQL statements that raised an error'
+)
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    db_queries.labels(statement.lstrip().split(None, 1)[0].upper()).inc()
+
+
+def _count_error(context):
+    db_errors.inc()
+
+
+def instrument_sqlalchemy():
+    """Count every SQL statement executed by any engine"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+        event.listen(Engine, 'handle_error', _count_error)
@@ -20,6 +20,16 @@ class Role(db.Model):
 
 class Employee(db.Model):
     __tablename__ = 'employee'
+    __table_args__ = (
+        # Sort orders of the employee directory
+        db.Index('ix_employee_name', 'last_name', 'first_name'),
+        db.Index('ix_employee_department', 'department'),
+        # Case-insensitive prefix search: lower(column) range scans
+        db.Index('ix_employee_first_name_lower', db.text('lower(first_name)')),
+        db.Index('ix_employee_last_name_lower', db.text('lower(last_name)')),
+        db.Index('ix_employee_email_lower', db.text('lower(email)')),
+        db.Index('ix_employee_department_lower', db.text('lower(department)')),
+    )
     
     employee_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     role_id = db.Column(db.Integer, db.ForeignKey('role.role_id'), nullable=False)
@@ -39,6 +49,10 @@ class Employee(db.Model):
 
 class BiometricData(db.Model):
     __tablename__ = 'biometric_data'
+    __table_args__ = (
+        db.Index('ix_biometric_data_employee_active', 'employee_id', 'is_active'),
+        db.Index('ix_biometric_data_active_employee', 'is_active', 'employee_id'),
+    )
     
     biometric_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     employee_id = db.Column(db.Integer, db.ForeignKey('employee.employee_id'), nullable=False)
@@ -50,12 +64,36 @@ class BiometricData(db.Model):
 
 class AuthenticationLog(db.Model):
     __tablename__ = 'authentication_log'
+    __table_args__ = (
+        db.Index('ix_authentication_log_timestamp', 'attempt_timestamp', 'log_id'),
+        db.Index('ix_authentication_log_result_timestamp', 'result', 'attempt_timestamp'),
+        db.Index('ix_authentication_log_employee_timestamp', 'employee_id', 'attempt_timestamp'),
+    )
     
     log_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    employee_id = db.Column(db.Integer, db.ForeignKey('employee.employee_id'), nullable=False)
+    # NULL for frames rejected by the quality gate before any match was attempted
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.employee_id'), nullable=True)
     attempt_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     result = db.Column(db.String(20), nullable=False)
     confidence_score = db.Column(db.Float)
     failure_reason = db.Column(db.String(100))
     device_location = db.Column(db.String(100))
-    processing_time_ms = db.Column(db.Integer)
\ No newline at end of file
+    processing_time_ms = db.Column(db.Integer)
+
+class AuthenticationStats(db.Model):
+    """Daily rollup of AuthenticationLog, maintained by the log writer"""
+    __tablename__ = 'authentication_stats'
+    
+    stat_date = db.Column(db.Date, primary_key=True)
+    total_attempts = db.Column(db.Integer, nullable=False, default=0)
+    successful_attempts = db.Column(db.Integer, nullable=False, default=0)
+
+class GalleryChange(db.Model):
+    """Append-only feed of employees whose face templates changed, for gallery.sync()"""
+    __tablename__ = 'gallery_change'
+    # AUTOINCREMENT: versions are never reused, even after the newest row is deleted
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    version = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    employee_id = db.Column(db.Integer, nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow)
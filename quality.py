@@ -0,0 +1,54 @@
+import cv2
+
+# Reason codes stored in AuthenticationLog.failure_reason for rejected frames
+BLURRY = 'QUALITY_BLURRY'
+TOO_DARK = 'QUALITY_TOO_DARK'
+TOO_BRIGHT = 'QUALITY_TOO_BRIGHT'
+FACE_TOO_SMALL = 'QUALITY_FACE_TOO_SMALL'
+
+MESSAGES = {
+    BLURRY: 'Image is blurry, hold still',
+    TOO_DARK: 'Image is too dark, improve the lighting',
+    TOO_BRIGHT: 'Image is overexposed, reduce the lighting',
+    FACE_TOO_SMALL: 'Face is too small, move closer to the camera',
+}
+
+DEFAULT_THRESHOLDS = {
+    'min_sharpness': 50.0,      # Laplacian variance of the downscaled grayscale frame
+    'min_brightness': 40.0,     # Mean gray level, 0-255
+    'max_brightness': 220.0,
+    'min_face_px': 80,          # Shorter side of the detected face box, in source pixels
+}
+
+# Frames are measured at this size so the checks cost the same for any camera resolution
+SAMPLE_SIZE = 256
+
+
+def frame_quality(rgb_image):
+    """(sharpness, brightness) of a frame: Laplacian variance and mean of a downscaled gray copy"""
+    gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+    scale = SAMPLE_SIZE / max(gray.shape)
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    _, stddev = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_32F))
+    return float(stddev[0, 0]) ** 2, float(gray.mean())
+
+
+def check_frame(rgb_image, thresholds=DEFAULT_THRESHOLDS):
+    """Reason code if the frame can never match, else None; run before detection"""
+    sharpness, brightness = frame_quality(rgb_image)
+    if brightness < thresholds['min_brightness']:
+        return TOO_DARK
+    if brightness > thresholds['max_brightness']:
+        return TOO_BRIGHT
+    if sharpness < thresholds['min_sharpness']:
+        return BLURRY
+    return None
+
+
+def check_face(face, image_shape, thresholds=DEFAULT_THRESHOLDS):
+    """Reason code if a detected face is too small to match reliably, else None"""
+    height, width = image_shape[:2]
+    if min(face.width * width, face.height * height) < thresholds['min_face_px']:
+        return FACE_TOO_SMALL
+    return None
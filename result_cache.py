@@ -0,0 +1,133 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from tracker import tracking_frame
+
+
+def content_digest(image_bytes):
+    return hashlib.blake2b(image_bytes, digest_size=16).digest()
+
+
+def dhash(image_bytes):
+    """64-bit difference hash of a frame: which of each pair of neighbouring pixels is brighter"""
+    gray = cv2.resize(tracking_frame(image_bytes), (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (gray[:, 1:] > gray[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+class CachedResult:
+    def __init__(self, value, phash, expires_at):
+        self.value = value
+        self.phash = phash
+        self.expires_at = expires_at
+
+
+class ResultCache:
+    """LRU/TTL cache of per-frame detection and match results, keyed by a hash of the image bytes
+
+    Entries are tagged with the gallery generation they were matched
+    against; the whole cache is dropped as soon as the gallery changes.
+    With phash_distance set, frames whose perceptual hash is within that
+    many bits of a cached frame are hits as well.
+    """
+
+    def __init__(self, max_entries=1024, ttl=5.0, phash_distance=None, enabled=True):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.generation = None
+        self.configure(max_entries, ttl, phash_distance, enabled)
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def configure(self, max_entries=1024, ttl=5.0, phash_distance=None, enabled=True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.phash_distance = phash_distance
+        self.enabled = enabled
+        self.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def key(self, image_bytes):
+        """(content digest, perceptual hash or None) identifying a frame"""
+        phash = dhash(image_bytes) if self.phash_distance is not None else None
+        return content_digest(image_bytes), phash
+
+    def _check_generation(self, generation):
+        # Called with the lock held
+        if generation != self.generation:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self.generation = generation
+
+    def _nearest(self, phash, now):
+        best, best_distance = None, self.phash_distance + 1
+        for digest, entry in self._entries.items():
+            if entry.phash is None or entry.expires_at < now:
+                continue
+            distance = (entry.phash ^ phash).bit_count()
+            if distance < best_distance:
+                best, best_distance = digest, distance
+        return best
+
+    def get(self, key, generation):
+        """Cached result for the frame, or None; generation is the gallery's current one"""
+        if not self.enabled:
+            return None
+        digest, phash = key
+        now = time.monotonic()
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(digest)
+            if entry is not None and entry.expires_at < now:
+                del self._entries[digest]
+                self.expirations += 1
+                entry = None
+            near = False
+            if entry is None and phash is not None:
+                digest = self._nearest(phash, now)
+                entry = self._entries.get(digest) if digest is not None else None
+                near = entry is not None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            self.near_hits += near
+            return entry.value
+
+    def put(self, key, generation, value):
+        """Cache a result computed against the given gallery generation"""
+        if not self.enabled:
+            return
+        digest, phash = key
+        with self._lock:
+            if self.generation is not None and generation < self.generation:
+                return  # Matched against a gallery that has since changed
+            self._check_generation(generation)
+            self._entries[digest] = CachedResult(value, phash, time.monotonic() + self.ttl)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+result_cache = ResultCache()
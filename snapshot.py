@@ -0,0 +1,56 @@
+import os
+import struct
+
+import numpy as np
+
+from face_index import VECTOR_DIMS
+
+# Layout: 64-byte header, int64 ids[count], float32 vectors[count, dims]
+MAGIC = b'FGAL'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sBBHqq')
+HEADER_SIZE = 64
+
+
+class GallerySnapshot:
+    """Read-only memory map of a gallery snapshot; ids and vectors are views into the page cache"""
+
+    def __init__(self, path):
+        self.path = path
+        stat = os.stat(path)
+        self.identity = (stat.st_ino, stat.st_mtime_ns)
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        magic, format_version, _, dims, count, self.version = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION or dims != VECTOR_DIMS:
+            raise ValueError(f'{path} is not a gallery snapshot this version can read')
+        ids_end = HEADER_SIZE + count * 8
+        self.ids = np.frombuffer(self._map, dtype=np.int64, count=count, offset=HEADER_SIZE)
+        self.vectors = np.frombuffer(self._map, dtype=np.float32, count=count * dims,
+                                     offset=ids_end).reshape(count, dims)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def is_current(self):
+        """False once a newer snapshot has been swapped in at our path"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        return (stat.st_ino, stat.st_mtime_ns) == self.identity
+
+
+def write_snapshot(path, ids, vectors, version):
+    """Atomically replace path with a snapshot; workers mapping the old file keep reading it safely"""
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(ids), VECTOR_DIMS)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, VECTOR_DIMS, len(ids), version).ljust(HEADER_SIZE, b'\0')
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(ids.tobytes())
+        f.write(vectors.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
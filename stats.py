@@ -0,0 +1,84 @@
+from datetime import datetime
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Employee, AuthenticationLog, AuthenticationStats
+
+UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def bump_daily_stats(rows):
+    """Add AuthenticationLog rows to the daily rollup in the caller's transaction"""
+    per_day = {}
+    for row in rows:
+        counts = per_day.setdefault(row['attempt_timestamp'].date(), [0, 0])
+        counts[0] += 1
+        counts[1] += row['result'] == 'SUCCESS'
+
+    table = AuthenticationStats.__table__
+    insert = UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    for stat_date, (total, successes) in per_day.items():
+        if insert is not None:
+            statement = insert(table).values(stat_date=stat_date, total_attempts=total, successful_attempts=successes)
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=[table.c.stat_date],
+                set_={
+                    'total_attempts': table.c.total_attempts + statement.excluded.total_attempts,
+                    'successful_attempts': table.c.successful_attempts + statement.excluded.successful_attempts
+                }
+            ))
+        else:
+            stats = db.session.get(AuthenticationStats, stat_date)
+            if stats is None:
+                stats = AuthenticationStats(stat_date=stat_date, total_attempts=0, successful_attempts=0)
+                db.session.add(stats)
+            stats.total_attempts += total
+            stats.successful_attempts += successes
+
+
+def rebuild_daily_stats():
+    """Recompute the whole rollup from AuthenticationLog (one aggregate scan)"""
+    day = func.date(AuthenticationLog.attempt_timestamp)
+    totals = db.session.query(
+        day,
+        func.count(AuthenticationLog.log_id),
+        func.sum(case((AuthenticationLog.result == 'SUCCESS', 1), else_=0))
+    ).group_by(day).all()
+
+    AuthenticationStats.query.delete()
+    db.session.add_all([
+        AuthenticationStats(
+            stat_date=datetime.strptime(str(stat_date), '%Y-%m-%d').date(),
+            total_attempts=total,
+            successful_attempts=successes or 0
+        )
+        for stat_date, total, successes in totals
+    ])
+    db.session.commit()
+    return len(totals)
+
+
+def dashboard_counts():
+    """Employee and authentication counters for the dashboard, one query each"""
+    total_employees, active_employees = db.session.query(
+        func.count(Employee.employee_id),
+        func.coalesce(func.sum(case((Employee.is_active == True, 1), else_=0)), 0)  # noqa: E712
+    ).one()
+
+    today = datetime.utcnow().date()
+    total_attempts, successful_attempts, today_auths = db.session.query(
+        func.coalesce(func.sum(AuthenticationStats.total_attempts), 0),
+        func.coalesce(func.sum(AuthenticationStats.successful_attempts), 0),
+        func.coalesce(func.sum(case(
+            (AuthenticationStats.stat_date == today, AuthenticationStats.total_attempts), else_=0
+        )), 0)
+    ).one()
+
+    return {
+        'total_employees': total_employees,
+        'active_employees': active_employees,
+        'today_auths': today_auths,
+        'total_attempts': total_attempts,
+        'successful_attempts': successful_attempts
+    }
@@ -0,0 +1,166 @@
+import json
+import threading
+import time
+
+
+class StreamSession:
+    """One camera's stream: a single latest-frame slot, a processing thread and the last result
+
+    Frames that arrive while one is being processed overwrite the slot, so
+    the server never works on more than one stale frame per camera.
+    """
+
+    def __init__(self, session_id, process, idle_timeout, on_close):
+        self.session_id = session_id
+        self._process = process
+        self._idle_timeout = idle_timeout
+        self._on_close = on_close
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_at = None
+        self.result = None
+        self.result_seq = 0
+        self.received = 0
+        self.dropped = 0
+        self.processed = 0
+        self.closed = False
+        self.last_active = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name=f'stream-{session_id}', daemon=True)
+        self._thread.start()
+
+    def submit(self, image_bytes):
+        with self._cond:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = image_bytes
+            self._frame_at = time.monotonic()
+            self.received += 1
+            self.last_active = self._frame_at
+            self._cond.notify_all()
+
+    def wait_result(self, after_seq, timeout):
+        """(seq, result) of the first result newer than after_seq, or (after_seq, None) on timeout"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            # A connected listener keeps the session open even while no frames arrive
+            self.last_active = time.monotonic()
+            while self.result_seq <= after_seq and not self.closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return after_seq, None
+                self._cond.wait(remaining)
+            self.last_active = time.monotonic()
+            if self.result_seq <= after_seq:
+                return after_seq, None
+            return self.result_seq, self.result
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._frame is None and not self.closed:
+                    if time.monotonic() - self.last_active > self._idle_timeout:
+                        self.closed = True
+                        break
+                    self._cond.wait(self._idle_timeout)
+                if self.closed:
+                    self._cond.notify_all()
+                    break
+                image_bytes, received_at = self._frame, self._frame_at
+                self._frame = None
+            try:
+                result = self._process(self.session_id, image_bytes)
+            except Exception as e:
+                result = {'result': 'ERROR', 'message': f'Processing error: {str(e)}', 'confidence': 0.0}
+            # Time from the frame's arrival to its result, including any wait in the slot
+            result['latency_ms'] = round((time.monotonic() - received_at) * 1000, 1)
+            with self._cond:
+                self.processed += 1
+                self.result_seq += 1
+                self.result = result
+                self._cond.notify_all()
+        self._on_close(self)
+
+
+class StreamHub:
+    """Open camera streams by session id; each gets a thread that processes only its newest frame
+
+    Sessions are in-process state: a session's frame uploads and its event
+    stream have to be served by the same process.
+    """
+
+    def __init__(self, max_sessions=100, idle_timeout=30.0):
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self.process = None
+        self.configure(max_sessions, idle_timeout)
+        self.dropped = 0
+        self.processed = 0
+
+    def configure(self, max_sessions=100, idle_timeout=30.0, process=None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        if process is not None:
+            self.process = process
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def session(self, session_id, create=True):
+        """The open session, started on first use; None if absent (create=False) or at capacity"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and session.closed and create:
+                session = None
+            if session is None and create and len(self._sessions) < self.max_sessions:
+                session = StreamSession(session_id, self.process, self.idle_timeout, self._closed)
+                self._sessions[session_id] = session
+            return session
+
+    def submit(self, session_id, image_bytes):
+        session = self.session(session_id)
+        if session is not None:
+            session.submit(image_bytes)
+        return session
+
+    def events(self, session_id, keepalive=15.0):
+        """Server-sent events with every new result of the session until it closes"""
+        session = self.session(session_id)
+        if session is None:
+            return
+        seq = session.result_seq
+        while not session.closed:
+            seq, result = session.wait_result(seq, keepalive)
+            if result is None:
+                yield ': keepalive\n\n'
+                continue
+            yield f'id: {seq}\nevent: result\ndata: {json.dumps(result)}\n\n'
+        yield 'event: closed\ndata: {}\n\n'
+
+    def close(self, session_id):
+        session = self.session(session_id, create=False)
+        if session is not None:
+            session.close()
+
+    def _closed(self, session):
+        with self._lock:
+            if self._sessions.get(session.session_id) is session:
+                del self._sessions[session.session_id]
+            self.dropped += session.dropped
+            self.processed += session.processed
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            'sessions': len(sessions),
+            'processed': self.processed + sum(session.processed for session in sessions),
+            'dropped': self.dropped + sum(session.dropped for session in sessions),
+        }
+
+
+stream_hub = StreamHub()
@@ -0,0 +1,34 @@
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+    """Per-request wall-clock timer with named stages, measured with perf_counter_ns"""
+
+    def __init__(self):
+        self.start_ns = time.perf_counter_ns()
+        self.stages_ns = {}
+
+    @contextmanager
+    def stage(self, name):
+        stage_start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter_ns() - stage_start)
+
+    def add(self, name, elapsed_ns):
+        """Record time measured elsewhere (e.g. inside a worker process)"""
+        self.stages_ns[name] = self.stages_ns.get(name, 0) + elapsed_ns
+
+    def elapsed_ms(self):
+        return (time.perf_counter_ns() - self.start_ns) / 1_000_000
+
+    def total_ms(self):
+        """Whole milliseconds since the request started, as stored in processing_time_ms"""
+        return max(1, round(self.elapsed_ms()))
+
+    def breakdown(self):
+        timings = {name: round(elapsed_ns / 1_000_000, 3) for name, elapsed_ns in self.stages_ns.items()}
+        timings['total'] = round(self.elapsed_ms(), 3)
+        return timings
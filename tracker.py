@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from image_io import decode_reduced
+
+# Tracking frames are decoded this small (libjpeg reduced decoding), enough to see the face move
+TRACK_MAX_SIDE = 160
+THUMBNAIL_SIZE = (24, 24)
+
+
+def tracking_frame(image_bytes):
+    """Small grayscale copy of a frame used only for drift checks"""
+    rgb_image, _ = decode_reduced(image_bytes, TRACK_MAX_SIDE)
+    return cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+
+
+def face_thumbnail(gray, face):
+    """The face box (relative coordinates; None for the whole frame) of a tracking frame, resized to THUMBNAIL_SIZE"""
+    if face is None:
+        return cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+    height, width = gray.shape
+    x0 = min(max(0, int(face.xmin * width)), width - 1)
+    y0 = min(max(0, int(face.ymin * height)), height - 1)
+    x1 = max(x0 + 1, min(width, int((face.xmin + face.width) * width)))
+    y1 = max(y0 + 1, min(height, int((face.ymin + face.height) * height)))
+    return cv2.resize(gray[y0:y1, x0:x1], THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def thumbnail_drift(before, after):
+    """Mean absolute difference of two thumbnails, 0 (identical) to 1, after removing brightness shifts"""
+    return float(np.abs((before - before.mean()) - (after - after.mean())).mean() / 255.0)
+
+
+class TrackedFace:
+    def __init__(self, face, thumbnail, payload):
+        self.face = face
+        self.thumbnail = thumbnail
+        self.payload = payload
+        self.detected_at = time.monotonic()
+        self.frames = 0
+
+
+class FaceTracker:
+    """Per-session memory of the last confirmed face so video frames can skip detection and matching
+
+    A session's result is reused while the face region stays still; any
+    drift, the timeout or every redetect_every frames forces a full pass.
+    Frames without a face are remembered too: while the whole scene stays
+    within max_scene_drift of it, the kiosk's empty view skips MediaPipe.
+    """
+
+    def __init__(self, redetect_every=15, timeout=2.0, max_drift=0.08, max_sessions=1000, max_scene_drift=0.02):
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self.configure(redetect_every, timeout, max_drift, max_sessions, max_scene_drift)
+        self.tracked = 0
+        self.static_scenes = 0
+        self.redetected = 0
+
+    def configure(self, redetect_every=15, timeout=2.0, max_drift=0.08, max_sessions=1000, max_scene_drift=0.02):
+        self.redetect_every = redetect_every
+        self.timeout = timeout
+        self.max_drift = max_drift
+        self.max_sessions = max_sessions
+        self.max_scene_drift = max_scene_drift
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def lookup(self, session_id, gray):
+        """The cached payload if this frame can reuse the session's last result, else None"""
+        with self._lock:
+            state = self._sessions.get(session_id)
+        if state is None:
+            return None
+        max_drift = self.max_drift if state.face is not None else self.max_scene_drift
+        if (state.frames + 1 >= self.redetect_every
+                or time.monotonic() - state.detected_at > self.timeout
+                or thumbnail_drift(state.thumbnail, face_thumbnail(gray, state.face)) > max_drift):
+            self.forget(session_id)
+            return None
+        state.frames += 1
+        self.tracked += 1
+        if state.face is None:
+            self.static_scenes += 1
+        return state.payload
+
+    def update(self, session_id, gray, face, payload):
+        """Remember a confirmed identity or a frame without a usable face; failed matches clear the session"""
+        self.redetected += 1
+        if face is not None and payload.get('result') != 'SUCCESS':
+            self.forget(session_id)
+            return
+        state = TrackedFace(face, face_thumbnail(gray, face), payload)
+        with self._lock:
+            self._sessions[session_id] = state
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def forget(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+face_tracker = FaceTracker()
@@ -0,0 +1,221 @@
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from image_io import decode_reduced
+
+# Per-process detectors (by model_selection), cascade and detection resolution, set by the pool initializer
+_detectors = {}
+_model_selection = 0
+_min_detection_confidence = 0.5
+_cascade = None
+_detect_max_side = None
+
+
+def _detector(model_selection):
+    detector = _detectors.get(model_selection)
+    if detector is None:
+        from detection import mp_face_detection
+        detector = _detectors[model_selection] = mp_face_detection.FaceDetection(
+            model_selection=model_selection,
+            min_detection_confidence=_min_detection_confidence
+        )
+        detector.process(np.zeros((64, 64, 3), dtype=np.uint8))
+    return detector
+
+
+def _init_worker(model_selection, min_detection_confidence, detect_max_side=None, cascade_settings=None):
+    global _model_selection, _min_detection_confidence, _cascade, _detect_max_side
+    _model_selection = model_selection
+    _min_detection_confidence = min_detection_confidence
+    _detect_max_side = detect_max_side
+    if cascade_settings:
+        from cascade import FaceCascade
+        _cascade = FaceCascade(**cascade_settings)
+    _detector(model_selection)
+
+
+def _warm_worker():
+    """No-op task; the worker's initializer has loaded its detectors by the time it runs"""
+    return os.getpid()
+
+
+def _detect(rgb_image):
+    """Faces in a decoded frame, screened by the cascade first when one is configured"""
+    from detection import faces_from_results
+    model_selection = _model_selection
+    if _cascade is not None:
+        model_selection = _cascade.screen(rgb_image)
+        if model_selection is None:
+            return []
+    return faces_from_results(_detector(model_selection).process(rgb_image))
+
+
+def _detect_shared_frame(shm_name, size, quality_thresholds=None):
+    """Decode and detect a frame that the parent placed in shared memory
+
+    Returns (image_shape, faces, stage_ns, rejection) where stage_ns holds the
+    decode, quality and detection times measured inside the worker. With
+    quality_thresholds, a frame failing check_frame is not run through the
+    detector and rejection holds its reason code.
+    """
+    from quality import check_frame
+    # Workers share the parent's resource tracker, so attaching here does not
+    # change ownership: the parent unlinks the block once the result is back
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        decode_start = time.perf_counter_ns()
+        frame = np.ndarray((size,), dtype=np.uint8, buffer=shm.buf)
+        rgb_image, image_shape = decode_reduced(frame, _detect_max_side)
+        del frame
+        quality_start = time.perf_counter_ns()
+        rejection = check_frame(rgb_image, quality_thresholds) if quality_thresholds else None
+        detect_start = time.perf_counter_ns()
+        faces = [] if rejection else _detect(rgb_image)
+        stage_ns = {
+            'decode': quality_start - decode_start,
+            'quality': detect_start - quality_start,
+            'detection': time.perf_counter_ns() - detect_start
+        }
+        return image_shape, faces, stage_ns, rejection
+    finally:
+        shm.close()
+
+
+# Open archives, cached per worker so each zip's directory is read once
+_archives = {}
+
+
+def _read_source(source):
+    path, member = source
+    if member is None:
+        return np.fromfile(path, dtype=np.uint8)
+    archive = _archives.get(path)
+    if archive is None:
+        archive = _archives[path] = zipfile.ZipFile(path)
+    return np.frombuffer(archive.read(member), dtype=np.uint8)
+
+
+def _detect_file(source):
+    """Read, decode and detect an image file (path, zip member or None) inside the worker
+
+    Returns (image_shape, faces, error); error is a message instead of an
+    exception so one bad file does not abort a whole map().
+    """
+    try:
+        rgb_image, image_shape = decode_reduced(_read_source(source), _detect_max_side)
+        return image_shape, _detect(rgb_image), None
+    except Exception as e:
+        return None, [], str(e) or e.__class__.__name__
+
+
+class DetectionWorkers:
+    """Process pool that decodes and detects frames outside the GIL"""
+
+    def __init__(self):
+        self._executor = None
+        self._start_lock = threading.Lock()
+        self.size = None
+        self.model_selection = 0
+        self.min_detection_confidence = 0.5
+        self.detect_max_side = None
+        self.cascade_settings = None
+
+    def configure(self, size=None, model_selection=0, min_detection_confidence=0.5, detect_max_side=None,
+                  cascade_settings=None):
+        self.close()
+        self.size = size or os.cpu_count() or 1
+        self.model_selection = model_selection
+        self.min_detection_confidence = min_detection_confidence
+        self.detect_max_side = detect_max_side
+        self.cascade_settings = cascade_settings
+
+    def start(self):
+        executor = self._executor
+        if executor is None:
+            # Concurrent first requests must not each spawn a pool of MediaPipe processes
+            with self._start_lock:
+                if self._executor is None:
+                    # spawn: MediaPipe's threads do not survive fork
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.size,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_worker,
+                        initargs=(self.model_selection, self.min_detection_confidence, self.detect_max_side,
+                                  self.cascade_settings)
+                    )
+                executor = self._executor
+        return executor
+
+    def warm(self):
+        """Spawn every worker process now instead of on the first frames
+
+        Spawn-context pools start a process per submitted task while none is
+        idle, so one no-op task per worker brings the whole pool up.
+        """
+        executor = self.start()
+        for future in [executor.submit(_warm_worker) for _ in range(self.size)]:
+            future.result()
+
+    def detect(self, image_bytes, quality_thresholds=None):
+        """Return (image_shape, faces, stage_ns, rejection) for an encoded frame"""
+        executor = self.start()
+        shm = shared_memory.SharedMemory(create=True, size=max(len(image_bytes), 1))
+        try:
+            shm.buf[:len(image_bytes)] = image_bytes
+            return executor.submit(_detect_shared_frame, shm.name, len(image_bytes), quality_thresholds).result()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def detect_many(self, images, quality_thresholds=None):
+        """detect() for several encoded frames, spread across the worker processes"""
+        executor = self.start()
+        blocks = []
+        try:
+            for image_bytes in images:
+                shm = shared_memory.SharedMemory(create=True, size=max(len(image_bytes), 1))
+                blocks.append(shm)
+                shm.buf[:len(image_bytes)] = image_bytes
+            futures = [
+                executor.submit(_detect_shared_frame, shm.name, len(image_bytes), quality_thresholds)
+                for shm, image_bytes in zip(blocks, images)
+            ]
+            return [future.result() for future in futures]
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+
+    def detect_files(self, sources, chunksize=8):
+        """Yield (source, image_shape, faces, error) for (path, zip_member) sources, in order
+
+        Workers read the files themselves, so image bytes never cross the pipe.
+        """
+        executor = self.start()
+        sources = list(sources)
+        for source, result in zip(sources, executor.map(_detect_file, sources, chunksize=chunksize)):
+            yield (source, *result)
+
+    def after_fork(self):
+        """Forget a pool inherited over fork(); its processes and threads belong to the parent"""
+        self._executor = None
+        self._start_lock = threading.Lock()
+
+    def close(self):
+        with self._start_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+detection_workers = DetectionWorkers()
+atexit.register(detection_workers.close)
+os.register_at_fork(after_in_child=detection_workers.after_fork)